@@ -1,27 +1,48 @@
 # ============================== 
 # IMPORTACIÓN DE LIBRERÍAS
 # ==============================
-from flask import Flask, render_template, request, send_file, session, jsonify, redirect, make_response, g, Response
+from flask import Flask, render_template, request, send_file, session, jsonify, redirect, make_response, g, Response, has_request_context
 import mysql.connector
-from mysql.connector import pooling
-from pyproj import Transformer
-import csv, io, os, glob, time, uuid, hmac, json, base64
+import os, time, hmac, json, base64, hashlib, tempfile, sqlite3, threading
+from contextlib import contextmanager
 from collections import defaultdict
-from openpyxl import Workbook
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.styles import Font, PatternFill
 from datetime import datetime
-from openpyxl.utils import get_column_letter
-from typing import cast
+from functools import wraps
 from dotenv import load_dotenv
-
+from werkzeug.http import is_resource_modified
+from buscador.artefactos import AlmacenArtefactos
+from buscador.cache_coordenadas import CacheCoordenadas
+from buscador.cache_resultados import CacheResultados
+from buscador.clustering import Clusterizador
+from buscador.compresion import (
+    EstaticosComprimidos, comprimir, comprimir_por_bloques, elegir_codificacion, es_comprimible
+)
+from buscador.exportadores import SumideroCSV, SumideroExcel, SumideroGeoJSON, SumideroNDJSON
+from buscador.facetas import ServicioFacetas
+from buscador.fechas import NormalizadorFechas, columnas_fecha
+from buscador.filas import Esquema, Lote
+from buscador.flujo import Flujo, lotes_cursor, muestreo_uniforme
+from buscador.indice_texto import IndiceTexto, tokens
+from buscador.indices import diagnosticar, sugerencia_indice
+from buscador.metadatos import ConsultasMetadatos
+from buscador.metricas import Medicion, Registro
+from buscador.pool import PoolAgotado, PoolConexiones
+from buscador.puntos import CAMPOS_POPUP, CacheConjuntos, ConjuntoPuntos, SumideroPuntos, muestrear
+from buscador.reproyeccion import (
+    COL_EPSG, COL_LAT, COL_LON, ResumenReproyeccion, precargar, reproyectar_lote
+)
+from buscador.sugerencias import IndiceSugerencias
+from buscador.trabajos import LISTO, ColaTrabajos, LimiteTrabajos, progreso
+from buscador.version_datos import VersionDatos
+
+_T_INICIO = time.perf_counter()  # para medir la importación del módulo
 load_dotenv()  # Cargar variables del .env
 
 # ==============================
 # CONFIGURACIÓN GENERAL DE FLASK
 # ==============================
 app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "cambia-esta-clave")  # solo para session de Flask (export paths)
+app.secret_key = os.getenv("FLASK_SECRET_KEY", "cambia-esta-clave")  # solo para session de Flask (consulta a exportar)
 app.config['EXPORT_FOLDER'] = os.getenv("EXPORT_FOLDER", 'temp_exports')
 os.makedirs(app.config['EXPORT_FOLDER'], exist_ok=True)
 
@@ -59,6 +80,7 @@ HUB_HOME = os.getenv("HUB_HOME", "http://127.0.0.1:8000/choose")
 ANON_PATHS = set((
     # "/"  # ← quitado: la raíz ahora exige SSO vía Hub
     "/health", "/healthz",
+    # "/metrics" se agrega solo si hay METRICAS_TOKEN (ver MÉTRICAS Y TIEMPOS POR FASE)
     "/favicon.ico", "/robots.txt",
     # Si NO quieres exponer docs del buscador, no agregues aquí sus rutas
 ))
@@ -118,7 +140,7 @@ def _verify_st(token: str) -> dict | None:
 
 # ============ Cookie de sesión local firmada ============
 # Podemos reutilizar el secret del gateway; si prefieres, define BUSCADOR_SESSION_SECRET aparte.
-from itsdangerous import TimestampSigner, BadSignature, SignatureExpired
+from itsdangerous import TimestampSigner, URLSafeSerializer, BadSignature, SignatureExpired
 _svc_signer = TimestampSigner(os.getenv("BUSCADOR_SESSION_SECRET", GATEWAY_SHARED_SECRET))
 
 def _set_svc_session(resp, email: str):
@@ -202,7 +224,7 @@ def gate_after(resp):
 
     # Evitar cache de HTML por defecto
     ct = (resp.headers.get("Content-Type") or "").lower()
-    if "text/html" in ct:
+    if "text/html" in ct and "ETag" not in resp.headers:
         resp.headers["Cache-Control"] = "no-store"
     # Cache extendida para assets estáticos (siempre que pasen por Flask)
     if request.path.startswith("/static/"):
@@ -217,19 +239,6 @@ def logout_local():
     resp.headers["Clear-Site-Data"] = '"cache","cookies","storage"'
     return resp
 
-# ==========================================================
-# FUNCIÓN PARA LIMPIAR ARCHIVOS ANTIGUOS (CSV Y EXCEL > 1h)
-# ==========================================================
-def limpiar_archivos_antiguos():
-    una_hora_atras = time.time() - 3600
-    for extension in ('*.csv', '*.xlsx'):
-        for archivo in glob.glob(os.path.join(app.config['EXPORT_FOLDER'], extension)):
-            if os.path.getmtime(archivo) < una_hora_atras:
-                try:
-                    os.remove(archivo)
-                except:
-                    pass
-
 # ========================================
 # CONFIGURACIÓN DEL POOL DE CONEXIONES DB
 # ========================================
@@ -254,7 +263,254 @@ dbconfig = {
     "autocommit": True,
     "connection_timeout": 10,
 }
-cnxpool = pooling.MySQLConnectionPool(pool_name="mypool", pool_size=5, **dbconfig)
+# Un pool por worker: cada hilo de gunicorn más los hilos de fondo (sincronización, índice, facetas)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or int(os.getenv("GUNICORN_THREADS", "1")) + 4)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def pool_bd() -> PoolConexiones:
+    """
+    Pool del proceso actual, creado al primer uso. Con preload_app el módulo
+    se importa en el master: un worker nunca usa (ni cierra) las conexiones
+    heredadas del fork, arma su propio pool.
+    """
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = PoolConexiones(
+                    lambda: mysql.connector.connect(**dbconfig),
+                    tamano=DB_POOL_SIZE,
+                    espera_max=float(os.getenv("DB_POOL_ESPERA", "10")),       # seg en cola antes de responder 503
+                    cola_max=int(os.getenv("DB_POOL_COLA_MAX", "32")),         # pedidos en espera como máximo
+                    vida_max=float(os.getenv("DB_POOL_VIDA_MAX", "1800")),     # seg; luego se recicla la conexión
+                    ping_tras=float(os.getenv("DB_POOL_PING_TRAS", "10")),     # ping a las conexiones ociosas más de N seg
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+# Facetas, columnas y conteos van por un pool async aparte (buscador/metadatos.py):
+# las consultas de un mismo pedido corren a la vez, una conexión cada una
+METADATOS_ASYNC = os.getenv("METADATOS_ASYNC", "1") == "1"
+METADATOS_POOL_SIZE = int(os.getenv("METADATOS_POOL_SIZE", "5"))  # una conexión por faceta
+_metadatos = None
+_metadatos_pid = None
+_metadatos_lock = threading.Lock()
+
+def metadatos_bd() -> ConsultasMetadatos:
+    """Pool async y event loop del proceso actual, creados al primer uso (como pool_bd())."""
+    global _metadatos, _metadatos_pid
+    if _metadatos_pid != os.getpid():
+        with _metadatos_lock:
+            if _metadatos_pid != os.getpid():
+                _metadatos = ConsultasMetadatos(
+                    dbconfig,
+                    tamano=METADATOS_POOL_SIZE,
+                    espera_max=float(os.getenv("METADATOS_ESPERA", "30")),     # seg por lote antes de responder 503
+                    vida_max=float(os.getenv("DB_POOL_VIDA_MAX", "1800")),
+                    ping_tras=float(os.getenv("DB_POOL_PING_TRAS", "10")),
+                )
+                _metadatos_pid = os.getpid()
+    return _metadatos
+
+# ==========================================
+# ARRANQUE POR WORKER (HILOS DE FONDO)
+# ==========================================
+# Los hilos no sobreviven a un fork: con preload_app los que se arrancaran al
+# importar quedarían solo en el master. Cada sección registra aquí cómo
+# arrancar los suyos y preparar_worker() los inicia una vez por proceso.
+_al_arrancar = []
+
+def al_arrancar(funcion) -> None:
+    """Registra funcion() para el arranque de cada worker (después del fork)."""
+    _al_arrancar.append(funcion)
+
+_worker_pid = None
+_worker_lock = threading.Lock()
+tiempos_arranque: dict[str, float] = {}  # etapa → segundos (se ve en /health y en /metrics)
+
+# ==========================================
+# MÉTRICAS Y TIEMPOS POR FASE
+# ==========================================
+METRICAS_DIR = os.getenv("METRICAS_DIR", os.path.join("cache", "metricas"))  # instantáneas por worker
+METRICAS_INTERVALO = int(os.getenv("METRICAS_INTERVALO", "15"))  # seg entre volcados
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN", "")  # vacío = /metrics solo con sesión SSO, como el resto
+if METRICAS_TOKEN:
+    ANON_PATHS.add("/metrics")  # Prometheus entra sin sesión, con Authorization: Bearer <token>
+
+metricas = Registro()
+metricas.describir("buscador_request_segundos", "histogram", "Duración total del request, incluida la descarga en streaming.")
+metricas.describir("buscador_fase_segundos", "histogram", "Duración de cada fase del request (consulta, fetch, reproyección, escritura, render...).")
+metricas.describir("buscador_filas_total", "counter", "Filas leídas de MySQL por ruta.")
+metricas.describir("buscador_bytes_total", "counter", "Bytes escritos en exportaciones por ruta.")
+metricas.describir("buscador_pool_espera_segundos", "histogram", "Espera para obtener una conexión del pool.")
+metricas.describir("buscador_pool_agotado_total", "counter", "Pedidos de conexión rechazados por pool agotado.")
+metricas.describir("buscador_pool_conexiones", "gauge", "Conexiones del pool por estado (en_uso, libres, esperando).")
+metricas.describir("buscador_pool_cerradas_total", "counter", "Conexiones cerradas por el pool por motivo (recicladas, descartadas).")
+metricas.describir("buscador_no_modificado_total", "counter", "Respuestas 304 por ETag vigente, por ruta.")
+metricas.describir("buscador_cache_resultados_total", "counter", "Consultas a la caché de resultados por resultado (acierto/fallo).")
+metricas.describir("buscador_arranque_segundos", "gauge", "Duración del arranque de cada worker por etapa (importacion, columnas, facetas, transformadores...).")
+metricas.describir("buscador_primer_request_segundos", "gauge", "Duración del primer request atendido por cada worker.")
+al_arrancar(lambda: metricas.iniciar_volcado(
+    METRICAS_DIR, METRICAS_INTERVALO, lambda e: app.logger.warning("No se pudieron volcar las métricas: %s", e)
+))
+
+def medicion_actual() -> Medicion:
+    """Medicion del request en curso (fuera de un request, una que se descarta)."""
+    if has_request_context() and "medicion" in g:
+        return g.medicion
+    return Medicion(metricas, "sin_request")
+
+def fase(nombre: str):
+    """with fase("consulta"): ... → tiempo en Server-Timing y en buscador_fase_segundos."""
+    return medicion_actual().fase(nombre)
+
+@contextmanager
+def conexion_bd():
+    """
+    with conexion_bd() as conn: ... → conexión del pool que siempre se
+    devuelve (si hubo excepción se descarta). Mide la espera en la cola.
+    """
+    t0 = time.perf_counter()
+    try:
+        conn = pool_bd().obtener()
+    except PoolAgotado:
+        metricas.incrementar("buscador_pool_agotado_total")
+        raise
+    finally:
+        metricas.observar("buscador_pool_espera_segundos", time.perf_counter() - t0)
+    try:
+        yield conn
+    except BaseException:
+        pool_bd().devolver(conn, descartar=True)
+        raise
+    pool_bd().devolver(conn)
+
+def consultar_metadatos(consultas) -> list[list[tuple]]:
+    """
+    [(sql, valores), ...] de solo lectura → filas de cada una, en el mismo
+    orden: a la vez por el pool async o, con METADATOS_ASYNC=0, una tras
+    otra en una conexión del pool síncrono.
+    """
+    if METADATOS_ASYNC:
+        return metadatos_bd().consultar(consultas)
+    resultados = []
+    with conexion_bd() as conn:
+        cursor = conn.cursor()
+        for sql, valores in consultas:
+            cursor.execute(sql, valores)
+            resultados.append(cursor.fetchall())
+        cursor.close()
+    return resultados
+
+def _recolectar_pool():
+    estado = pool_bd().estadisticas()
+    for clave in ("en_uso", "libres", "esperando"):
+        metricas.fijar("buscador_pool_conexiones", estado[clave], estado=clave)
+    for clave in ("recicladas", "descartadas"):
+        metricas.fijar("buscador_pool_cerradas_total", estado[clave], motivo=clave)
+
+metricas.registrar_recolector(_recolectar_pool)
+
+@app.errorhandler(PoolAgotado)
+def pool_agotado(e):
+    app.logger.warning("Pool de conexiones agotado: %s", e)
+    if request.path.startswith("/api/"):
+        resp = jsonify({"error": "Servidor ocupado, intente de nuevo"})
+    else:
+        resp = make_response("Servidor ocupado, intente de nuevo en unos segundos.", 503)
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "2"
+    return resp
+
+@app.before_request
+def iniciar_medicion():
+    if request.endpoint and request.endpoint not in ("static", "metricas_prometheus"):
+        g.medicion = Medicion(metricas, request.endpoint)
+
+@app.after_request
+def cerrar_medicion(resp):
+    medicion = g.pop("medicion", None)
+    if medicion is not None:
+        resp.headers["Server-Timing"] = medicion.server_timing()
+        # En streaming las fases siguen después de este punto: se cierra al terminar la respuesta
+        resp.call_on_close(medicion.cerrar)
+        _medir_primer_request(resp, medicion)
+    return resp
+
+_primer_request_pid = None
+
+def _medir_primer_request(resp, medicion: Medicion) -> None:
+    """Duración del primer request de cada worker (el que pagaría un worker sin calentar)."""
+    global _primer_request_pid
+    if _primer_request_pid == os.getpid():
+        return
+    _primer_request_pid = os.getpid()
+
+    def registrar():
+        duracion = time.perf_counter() - medicion.inicio
+        tiempos_arranque["primer_request"] = round(duracion, 3)
+        metricas.fijar("buscador_primer_request_segundos", duracion, ruta=medicion.ruta, pid=str(os.getpid()))
+        app.logger.info("Primer request del worker %d (%s): %.3f s", os.getpid(), medicion.ruta, duracion)
+    resp.call_on_close(registrar)
+
+# ==========================================
+# COMPRESIÓN DE RESPUESTAS (GZIP / BROTLI)
+# ==========================================
+COMPRESION = os.getenv("COMPRESION", "1") == "1"
+COMPRESION_MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", "1024"))  # respuestas en memoria más chicas van tal cual
+COMPRESION_NIVELES = {
+    'gzip': int(os.getenv("COMPRESION_NIVEL", "6")),      # 1-9
+    'br': int(os.getenv("COMPRESION_NIVEL_BR", "4")),     # 0-11
+}
+
+estaticos_comprimidos = EstaticosComprimidos(app.static_folder, COMPRESION_MIN_BYTES)
+if COMPRESION:
+    estaticos_comprimidos.precomprimir()
+
+@app.after_request
+def comprimir_respuesta(resp):
+    """
+    Comprime según Accept-Encoding: estáticos desde la versión precomprimida,
+    respuestas en streaming bloque por bloque y el resto de una vez. No toca
+    lo que ya trae Content-Encoding, los rangos ni los HEAD.
+    """
+    if (not COMPRESION or request.method == 'HEAD' or resp.status_code != 200
+            or 'Content-Encoding' in resp.headers or not es_comprimible(resp.mimetype)
+            or 'no-transform' in (resp.headers.get('Cache-Control') or '')):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    codificacion = elegir_codificacion(request.accept_encodings)
+    if codificacion is None:
+        return resp
+
+    if request.endpoint == 'static':
+        datos = estaticos_comprimidos.obtener(request.view_args['filename'], codificacion)
+        if datos is None:
+            return resp
+        cerrar = getattr(resp.response, 'close', None)  # el archivo que send_file dejó abierto
+        if cerrar:
+            cerrar()
+        resp.direct_passthrough = False
+        resp.set_data(datos)
+    elif resp.is_streamed:
+        # direct_passthrough = archivo de send_file: no hace falta vaciar por bloque
+        resp.response = comprimir_por_bloques(resp.response, codificacion, COMPRESION_NIVELES[codificacion],
+                                              vaciar=not resp.direct_passthrough)
+        resp.headers.pop('Content-Length', None)
+    else:
+        datos = resp.get_data()
+        if len(datos) < COMPRESION_MIN_BYTES:
+            return resp
+        resp.set_data(comprimir(datos, codificacion, COMPRESION_NIVELES[codificacion]))
+
+    resp.headers['Content-Encoding'] = codificacion
+    resp.headers.pop('Accept-Ranges', None)  # los rangos serían sobre los bytes sin comprimir
+    etag, debil = resp.get_etag()
+    if etag and not debil:
+        resp.set_etag(etag, weak=True)  # otra representación de los mismos datos
+    return resp
 
 # Helper para calificar nombres con backticks
 def tq(schema: str, table: str) -> str:
@@ -266,397 +522,1433 @@ FULL_TABLE = tq(DB_NAME, DB_TABLE)
 # CACHÉ Y FUNCIÓN PARA OBTENER NOMBRES DE COLUMNAS
 # ================================================
 columnas_cache = []
+tipos_columnas_cache = {}
+clave_primaria_cache = None
 
 def obtener_columnas():
-    """Lee y cachea las columnas de la tabla a consultar."""
-    global columnas_cache
+    """Lee y cachea las columnas de la tabla a consultar (tipos y clave primaria)."""
+    global columnas_cache, tipos_columnas_cache, clave_primaria_cache
     if not columnas_cache:
-        conn = cnxpool.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"SHOW COLUMNS FROM {FULL_TABLE}")
-        columnas_cache = [col[0] for col in cursor.fetchall()]
-        cursor.close()
-        conn.close()
+        filas, = consultar_metadatos([(f"SHOW COLUMNS FROM {FULL_TABLE}", ())])
+        # SHOW COLUMNS → (Field, Type, Null, Key, Default, Extra)
+        primarias = [col[0] for col in filas if col[3] == 'PRI']
+        clave_primaria_cache = primarias[0] if len(primarias) == 1 else None
+        tipos_columnas_cache = {col[0]: str(col[1]).lower() for col in filas}
+        columnas_cache = [col[0] for col in filas]
     return columnas_cache
 
+def obtener_clave_primaria() -> str:
+    """
+    Columna usada para la paginación por llave (keyset).
+    DB_PK tiene prioridad; si no, se usa la PK simple detectada en SHOW COLUMNS.
+    """
+    forzada = os.getenv("DB_PK", "").strip()
+    if forzada:
+        return forzada
+    obtener_columnas()
+    if not clave_primaria_cache:
+        raise RuntimeError(f"La tabla {DB_TABLE} no tiene clave primaria simple; configure DB_PK")
+    return clave_primaria_cache
+
+# Helper para citar columnas con backticks
+def qc(col: str) -> str:
+    return f"`{col}`"
+
+# ==========================================
+# CAPTURA DE FILTROS Y CONSTRUCCIÓN DEL SQL
+# ==========================================
+# campo del formulario → columna. Los valores de las facetas salen de las
+# listas exactas (SELECT DISTINCT), así que se filtran por igualdad / IN y
+# pueden usar un índice; LIKE '%...%' queda solo para los campos de texto libre.
+FILTROS_FACETA = {
+    'filtro_municipio': 'Municipio',
+    'filtro_proyecto': 'Proyecto',
+    'filtro_especie': 'Nombre_cientifico',
+    'filtro_grupo_biologico': 'Grupo_Biologico',
+    'filtro_tipo_hidrobiota': 'Tipo_Hidrobiota',
+}
+FILTROS_TEXTO = {
+    'filtro_nombre_comun': 'Nombre_comun',
+    'codigo_de_muestra': 'Codigo_de_muestra',
+}
+FILTRO_MAX_VALORES = int(os.getenv("FILTRO_MAX_VALORES", "100"))  # valores por faceta como máximo
+
+# columnas clave que siempre incluimos en la exportación
+COLUMNAS_CLAVE = [
+    'Nombre_cientifico',
+    'Nombre_comun',
+    'Codigo_de_muestra',
+    'Proyecto',
+    'Fecha_de_colecta'
+]
+
+# Columnas mínimas necesarias para procesamiento (mapa y popups)
+COLUMNAS_MIN_PROC = {
+    'Latitud_decimal', 'Longitud_decimal', 'Codigo_EPSG_decimal',
+    'Nombre_cientifico', 'Nombre_comun', 'Codigo_de_muestra', 'Proyecto', 'Fecha_de_colecta'
+}
+
+def capturar_filtros(fuente) -> dict:
+    """
+    Normaliza los filtros de request.form / request.args en un dict plano
+    (mismos nombres que el formulario). Solo guarda los valores no vacíos,
+    así el mismo dict sirve como parámetros para /api/buscar.
+    """
+    spec = {}
+    palabra = (fuente.get('palabra') or '').strip()
+    if palabra:
+        spec['palabra'] = palabra
+        spec['columna'] = fuente.get('columna') or ''
+    for campo in FILTROS_FACETA:
+        # Varios valores por faceta; ordenados y sin repetir, así la firma de
+        # la consulta no depende del orden en que se eligieron
+        seleccion = sorted({v for v in fuente.getlist(campo) if v and v.strip()})
+        if seleccion:
+            spec[campo] = seleccion[:FILTRO_MAX_VALORES]
+    for campo in FILTROS_TEXTO:
+        valor = (fuente.get(campo) or '').strip()
+        if valor:
+            spec[campo] = valor
+    columnas_mostrar = [c for c in fuente.getlist('columnas_mostrar') if c]
+    if columnas_mostrar:
+        spec['columnas_mostrar'] = columnas_mostrar
+    return spec
+
+def resolver_columnas(spec: dict) -> tuple[list[str], list[str]]:
+    """Devuelve (columnas_mostrar, columnas_select) respetando el orden real de la tabla."""
+    columnas_disponibles = obtener_columnas()
+    columnas_mostrar = spec.get('columnas_mostrar') or []
+
+    # Si no se seleccionaron o pidieron __todas__
+    if '__todas__' in columnas_mostrar or not columnas_mostrar:
+        columnas_mostrar = columnas_disponibles.copy()
+    else:
+        columnas_mostrar = list(set(columnas_mostrar + COLUMNAS_CLAVE))
+
+    # Validamos contra columnas reales (respeta el orden de la tabla)
+    columnas_mostrar = [col for col in columnas_disponibles if col in columnas_mostrar]
+
+    columnas_requeridas = set(columnas_mostrar) | COLUMNAS_MIN_PROC
+    # Selección final respetando el orden real de la tabla
+    columnas_select = [c for c in columnas_disponibles if c in columnas_requeridas]
+    return columnas_mostrar, columnas_select
+
+def construir_where(spec: dict) -> tuple[str, list]:
+    """Arma el WHERE parametrizado (siempre empieza con 'WHERE 1=1')."""
+    columnas_disponibles = obtener_columnas()
+    filtros = []
+    valores = []
+
+    for campo, columna in FILTROS_FACETA.items():
+        seleccion = spec.get(campo)
+        if isinstance(seleccion, str):
+            seleccion = [seleccion]  # consultas guardadas antes de admitir varios valores
+        if not seleccion:
+            continue
+        if len(seleccion) == 1:
+            filtros.append(f"{qc(columna)} = %s")
+        else:
+            filtros.append(f"{qc(columna)} IN ({', '.join(['%s'] * len(seleccion))})")
+        valores.extend(seleccion)
+
+    for campo, columna in FILTROS_TEXTO.items():
+        valor = spec.get(campo)
+        if valor:
+            filtros.append(f"{qc(columna)} LIKE %s")
+            valores.append(f"%{valor}%")
+
+    palabra_clave = spec.get('palabra', '')
+    columna_clave = spec.get('columna', '')
+    if palabra_clave:
+        if columna_clave and columna_clave != "__todas__" and columna_clave in columnas_disponibles:
+            filtros.append(f"{qc(columna_clave)} LIKE %s")
+            valores.append(f"%{palabra_clave}%")
+        elif columna_clave == "__todas__" and columnas_disponibles:
+            condicion, valores_palabra = condicion_palabra_clave(palabra_clave, columnas_disponibles)
+            filtros.append(condicion)
+            valores.extend(valores_palabra)
+
+    where_sql = "WHERE 1=1"
+    if filtros:
+        where_sql += " AND " + " AND ".join(filtros)
+    return where_sql, valores
+
+def firma_consulta(spec: dict) -> str:
+    """Hash canónico de los filtros + columnas (identifica la consulta)."""
+    canonico = json.dumps(spec, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(canonico.encode("utf-8")).hexdigest()
+
+# ==========================================
+# CACHÉ DE RESULTADOS COMPARTIDA (WORKERS)
+# ==========================================
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join("cache", "resultados.sqlite"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "900"))  # seg
+DATA_VERSION_INTERVALO = int(os.getenv("DATA_VERSION_INTERVALO", "30"))  # seg entre sondeos de la tabla
+
+def sondear_version_datos() -> str:
+    """
+    Token que cambia cuando cambia la tabla: UPDATE_TIME de information_schema
+    más la PK máxima; si UPDATE_TIME está vacío (InnoDB tras reiniciar el
+    servidor) se usa conteo + PK máxima.
+    """
+    pk = clave_primaria_opcional()
+    with conexion_bd() as conn:
+        cursor = conn.cursor()
+        try:
+            try:
+                # MySQL 8 cachea las estadísticas de information_schema 24 h por defecto
+                cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+            except mysql.connector.Error:
+                pass  # MySQL 5.7 / MariaDB no tienen la variable
+            cursor.execute(
+                "SELECT UPDATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+                (DB_NAME, DB_TABLE)
+            )
+            fila = cursor.fetchone()
+            actualizado = fila[0] if fila else None
+            maximo = f"MAX({qc(pk)})" if pk else "NULL"
+            if actualizado is not None:
+                cursor.execute(f"SELECT {maximo} FROM {FULL_TABLE}")
+                return f"u:{actualizado}:{cursor.fetchone()[0]}"
+            cursor.execute(f"SELECT COUNT(*), {maximo} FROM {FULL_TABLE}")
+            conteo, ultimo = cursor.fetchone()
+            return f"c:{conteo}:{ultimo}"
+        finally:
+            cursor.close()
+
+version_datos = VersionDatos(sondear_version_datos, DATA_VERSION_INTERVALO)
+
+cache_resultados = None
+if RESULT_CACHE_PATH and RESULT_CACHE_MAX_MB > 0:
+    try:
+        cache_resultados = CacheResultados(RESULT_CACHE_PATH, RESULT_CACHE_MAX_MB * 1024 * 1024, RESULT_CACHE_TTL)
+        version_datos.al_cambiar(cache_resultados.invalidar)
+    except (sqlite3.Error, OSError) as e:
+        app.logger.warning("Caché de resultados desactivada: %s", e)
+
+def version_actual() -> str | None:
+    """Versión vigente de los datos, o None si la sonda falla (se consulta sin caché)."""
+    try:
+        return version_datos.actual()
+    except mysql.connector.Error as e:
+        app.logger.warning("No se pudo sondear la versión de los datos: %s", e)
+        return None
+
+def con_cache(tipo: str, partes, calcular):
+    """
+    Devuelve el resultado guardado para (tipo, partes) con la versión vigente
+    de los datos; si no hay, lo calcula con calcular() y lo guarda. `partes`
+    es el SQL ya resuelto (WHERE, valores, columnas), no el formulario: así
+    dos formularios equivalentes comparten la entrada.
+    """
+    version = version_actual() if cache_resultados is not None else None
+    if version is None:
+        return calcular()
+    canonico = json.dumps([tipo, partes], sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+    clave = hashlib.sha1(canonico.encode("utf-8")).hexdigest()
+    try:
+        valor = cache_resultados.obtener(clave, version)
+    except sqlite3.Error as e:
+        app.logger.warning("Caché de resultados no disponible: %s", e)
+        return calcular()
+    metricas.incrementar("buscador_cache_resultados_total", resultado="fallo" if valor is None else "acierto")
+    if valor is None:
+        valor = calcular()
+        try:
+            cache_resultados.guardar(clave, version, valor)
+        except sqlite3.Error as e:
+            app.logger.warning("Caché de resultados no disponible: %s", e)
+    return valor
+
+# ==========================================
+# VALIDADORES HTTP (ETag / Last-Modified)
+# ==========================================
+# Las respuestas de "/", "/columnas" y las /api/* de búsqueda dependen solo
+# de los datos (su versión), del usuario, de la ruta con su query y de las
+# plantillas desplegadas. Con eso se arma un ETag: si el navegador ya tiene
+# esa versión responde 304 sin ejecutar la vista (ni facetas ni consultas).
+CARPETA_PLANTILLAS = os.path.join(app.root_path, app.template_folder)
+
+def _huella_plantillas() -> tuple[str, float]:
+    """(hash, mtime máximo) de las plantillas: un despliegue nuevo cambia los ETags."""
+    h, mtime = hashlib.sha1(), 0.0
+    for raiz, _, archivos in sorted(os.walk(CARPETA_PLANTILLAS)):
+        for nombre in sorted(archivos):
+            ruta = os.path.join(raiz, nombre)
+            with open(ruta, 'rb') as f:
+                h.update(nombre.encode("utf-8") + b"\0" + f.read())
+            mtime = max(mtime, os.path.getmtime(ruta))
+    return h.hexdigest()[:12], mtime
+
+HUELLA_PLANTILLAS, MTIME_PLANTILLAS = _huella_plantillas()
+
+def _usuario_actual() -> str:
+    return getattr(g, "_svc_email", None) or getattr(g, "_set_cookie_email", None) or ""
+
+def ultima_modificacion(version: str) -> datetime | None:
+    """
+    UPDATE_TIME del token de versión ("u:AAAA-MM-DD HH:MM:SS:pk") o el mtime
+    de las plantillas si es posterior; None si la versión salió del conteo.
+    """
+    if not version.startswith("u:"):
+        return None
+    try:
+        fecha = datetime.strptime(version[2:21], "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+    return max(fecha, datetime.fromtimestamp(MTIME_PLANTILLAS).replace(microsecond=0))
+
+def condicional(vista):
+    """
+    ETag débil (versión de datos + estado de las cachés derivadas + usuario
+    + ruta y query + plantillas) y Last-Modified; If-None-Match vigente → 304. If-Modified-Since no se
+    usa para validar: UPDATE_TIME tiene resolución de segundos y no cubre
+    los cambios que solo mueven la PK máxima ni los del usuario.
+    Sin versión de datos (sonda caída) la vista responde normal, sin validadores.
+    """
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        version = version_actual()
+        if version is None:
+            return vista(*args, **kwargs)
+        # Las facetas y el índice de texto alcanzan la versión nueva más tarde:
+        # su propio estado también va en el ETag, si no un 304 fijaría la página vieja
+        partes = [version, estado_caches_derivadas(), _usuario_actual(), request.full_path, HUELLA_PLANTILLAS]
+        etag = hashlib.sha1("\n".join(partes).encode("utf-8")).hexdigest()[:32]
+        modificado = ultima_modificacion(version)
+
+        if not is_resource_modified(request.environ, etag=etag):
+            medicion_actual().contar("no_modificado", 1)
+            resp = Response(status=304)
+        else:
+            resp = make_response(vista(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+        resp.set_etag(etag, weak=True)
+        if modificado is not None:
+            resp.last_modified = modificado
+        # Cada uso se revalida (barato: 304) y no se comparte entre usuarios
+        resp.headers["Cache-Control"] = "private, no-cache"
+        resp.vary.add("Cookie")
+        return resp
+    return envoltura
+
+def contar_registros(where_sql: str, valores: list) -> int:
+    def contar():
+        filas, = consultar_metadatos([(f"SELECT COUNT(*) FROM {FULL_TABLE} {where_sql}", valores)])
+        return filas[0][0]
+    return con_cache("conteo", [where_sql, valores], contar)
+
+# ==========================================
+# VISTA PREVIA PARA RESULTADOS GRANDES
+# ==========================================
+# Se cuenta antes de leer filas; por encima del umbral la búsqueda pasa a
+# vista previa: la tabla muestra solo las primeras filas, el mapa una muestra
+# repartida sobre todo el resultado y las exportaciones van solo por trabajos
+# en segundo plano. El total real se sigue mostrando.
+VISTA_PREVIA_UMBRAL = int(os.getenv("VISTA_PREVIA_UMBRAL", "50000"))  # registros; 0 = sin vista previa
+VISTA_PREVIA_FILAS = int(os.getenv("VISTA_PREVIA_FILAS", "1000"))     # filas navegables en la tabla
+VISTA_PREVIA_PUNTOS = int(os.getenv("VISTA_PREVIA_PUNTOS", "20000"))  # puntos de la muestra del mapa
+
+def es_vista_previa(total: int) -> bool:
+    return VISTA_PREVIA_UMBRAL > 0 and total > VISTA_PREVIA_UMBRAL
+
 # ===============================
-# RUTA PRINCIPAL "/"
+# TRANSFORMACIÓN DE COORDENADAS
 # ===============================
-@app.route('/')
-def index():
-    conn = cnxpool.get_connection()
-    cursor = conn.cursor()
+# Caché persistente (SQLite local) de coordenadas WGS84 por PK + hash de origen
+COORD_CACHE_PATH = os.getenv("COORD_CACHE_PATH", os.path.join("cache", "coordenadas.sqlite"))
+COORD_SYNC_INTERVALO = int(os.getenv("COORD_SYNC_INTERVALO", "600"))  # seg; 0 = desactivado
+COORD_SYNC_LOTE = int(os.getenv("COORD_SYNC_LOTE", "5000"))
 
-    cursor.execute(f"SELECT DISTINCT Municipio FROM {FULL_TABLE} ORDER BY Municipio")
-    municipios = [row[0] for row in cursor.fetchall()]
+cache_coordenadas = None
+if COORD_CACHE_PATH:
+    try:
+        cache_coordenadas = CacheCoordenadas(COORD_CACHE_PATH)
+    except (sqlite3.Error, OSError) as e:
+        app.logger.warning("Caché de coordenadas desactivada: %s", e)
 
-    cursor.execute(f"SELECT DISTINCT Proyecto FROM {FULL_TABLE} ORDER BY Proyecto")
-    proyectos = [row[0] for row in cursor.fetchall()]
+def clave_primaria_opcional() -> str | None:
+    try:
+        return obtener_clave_primaria()
+    except RuntimeError:
+        return None
 
-    cursor.execute(f"SELECT DISTINCT Nombre_cientifico FROM {FULL_TABLE} ORDER BY Nombre_cientifico")
-    especies = [row[0] for row in cursor.fetchall()]
+def resolver_coordenadas(pks, lats, lons, epsgs):
+    """reproyectar_lote pasando por la caché persistente cuando hay PK."""
+    if cache_coordenadas is not None and pks is not None:
+        try:
+            return cache_coordenadas.resolver(pks, lats, lons, epsgs)
+        except sqlite3.Error as e:
+            app.logger.warning("Caché de coordenadas no disponible: %s", e)
+    return reproyectar_lote(lats, lons, epsgs)
 
-    cursor.execute(
-        f"SELECT DISTINCT Grupo_Biologico FROM {FULL_TABLE} "
-        f"WHERE Grupo_Biologico IS NOT NULL ORDER BY Grupo_Biologico"
+def transformar_coordenadas(lote: Lote) -> ResumenReproyeccion:
+    """
+    Agrega las columnas Latitud_mapa/Longitud_mapa (WGS84, arreglos tipados)
+    al lote, sin sobrescribir los valores decimales originales (proyectados).
+    """
+    pk = clave_primaria_opcional()
+    pks = lote.columna(pk) if pk and pk in lote else None
+    lats, lons, motivos = resolver_coordenadas(
+        pks, lote.columna(COL_LAT), lote.columna(COL_LON), lote.columna(COL_EPSG)
     )
-    grupos_biologicos = [row[0] for row in cursor.fetchall()]
+    lote.fijar_numerica('Latitud_mapa', lats)
+    lote.fijar_numerica('Longitud_mapa', lons)
+    return ResumenReproyeccion.desde_motivos(motivos)
+
+def registrar_reproyeccion(resumen: ResumenReproyeccion, origen: str) -> None:
+    if resumen.fallidas:
+        app.logger.warning(
+            "[%s] %d de %d filas sin coordenadas de mapa (inválidas=%d, epsg_desconocido=%d, fuera_de_rango=%d)",
+            origen, resumen.fallidas, resumen.total,
+            resumen.invalidas, resumen.epsg_desconocido, resumen.fuera_de_rango
+        )
 
-    cursor.execute(
-        f"SELECT DISTINCT Tipo_Hidrobiota FROM {FULL_TABLE} "
-        f"WHERE Tipo_Hidrobiota IS NOT NULL ORDER BY Tipo_Hidrobiota"
-    )
-    tipos_hidrobiota = [row[0] for row in cursor.fetchall()]
-
-    cursor.close()
-    conn.close()
-
-    return render_template(
-        'index.html',
-        columnas=obtener_columnas(),
-        municipios=municipios,
-        proyectos=proyectos,
-        especies=especies,
-        grupos_biologicos=grupos_biologicos,
-        tipos_hidrobiota=tipos_hidrobiota,
-        **brand_vars()
-    )
+def recorrer_por_llave(columnas: list[str], desde, lote: int):
+    """
+    Recorre la tabla completa por PK (WHERE pk > desde ORDER BY pk LIMIT lote)
+    y entrega listas de tuplas (pk, *columnas). La conexión se libera entre lotes.
+    """
+    pk = obtener_clave_primaria()
+    select_cols_sql = ", ".join(qc(c) for c in [pk] + columnas)
+    while True:
+        where_sql, valores = "", []
+        if desde is not None:
+            where_sql, valores = f"WHERE {qc(pk)} > %s", [desde]
+        with conexion_bd() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {select_cols_sql} FROM {FULL_TABLE} {where_sql} ORDER BY {qc(pk)} LIMIT %s",
+                valores + [lote]
+            )
+            filas = cursor.fetchall()
+            cursor.close()
+        if not filas:
+            return
+        yield filas
+        desde = filas[-1][0]
+
+def _lotes_sincronizacion(desde):
+    for filas in recorrer_por_llave([COL_LAT, COL_LON, COL_EPSG], desde, COORD_SYNC_LOTE):
+        yield ([f[0] for f in filas], [f[1] for f in filas], [f[2] for f in filas], [f[3] for f in filas])
+
+def _hilo_sincronizar_coordenadas():
+    """Precalcula en segundo plano las coordenadas de filas nuevas (PK mayor a la última vista)."""
+    while True:
+        try:
+            procesadas = cache_coordenadas.sincronizar_exclusivo(_lotes_sincronizacion)
+            if procesadas:
+                app.logger.info("Caché de coordenadas: %d filas nuevas sincronizadas", procesadas)
+        except RuntimeError as e:
+            # Sin clave primaria no hay sincronización incremental
+            app.logger.warning("Sincronización de coordenadas detenida: %s", e)
+            return
+        except Exception as e:
+            app.logger.warning("Sincronización de coordenadas falló: %s", e)
+        time.sleep(COORD_SYNC_INTERVALO)
+
+if cache_coordenadas is not None and COORD_SYNC_INTERVALO > 0:
+    al_arrancar(lambda: threading.Thread(target=_hilo_sincronizar_coordenadas, name="sync-coordenadas", daemon=True).start())
+
+# ==========================================
+# ÍNDICE DE TEXTO PARA "__todas__"
+# ==========================================
+INDICE_TEXTO_PATH = os.getenv("INDICE_TEXTO_PATH", os.path.join("cache", "indice_texto.sqlite"))
+INDICE_INTERVALO = int(os.getenv("INDICE_INTERVALO", "60"))  # seg entre refrescos incrementales; 0 = sin índice
+INDICE_COMPLETO_INTERVALO = int(os.getenv("INDICE_COMPLETO_INTERVALO", "21600"))  # pasada completa (ediciones/borrados)
+INDICE_EDICIONES_INTERVALO = int(os.getenv("INDICE_EDICIONES_INTERVALO", "600"))  # seg mínimos entre pasadas por cambio de datos
+INDICE_IN_MAX = int(os.getenv("INDICE_IN_MAX", "500"))  # PKs como parámetros sueltos; más → un solo JSON
+INDICE_LOTE = int(os.getenv("INDICE_LOTE", "2000"))
+
+indice_texto = None
+if INDICE_TEXTO_PATH and INDICE_INTERVALO > 0:
+    try:
+        indice_texto = IndiceTexto(INDICE_TEXTO_PATH)
+    except (sqlite3.Error, OSError) as e:
+        app.logger.warning("Índice de texto desactivado: %s", e)
+
+def _like_todas(columnas: list[str], texto: str) -> tuple[str, list]:
+    return "(" + " OR ".join(f"{qc(c)} LIKE %s" for c in columnas) + ")", [f"%{texto}%"] * len(columnas)
+
+def condicion_palabra_clave(palabra: str, columnas: list[str]) -> tuple[str, list]:
+    """
+    Condición de la palabra clave en "todas las columnas". Una sola regla:
+    con el índice listo una fila calza si contiene todas las palabras como
+    comienzo de alguna palabra de sus columnas, sin tildes ("tyran melan",
+    "bogota"; "123" encuentra 123 o 1234 pero no 51234). Las filas más
+    nuevas que el índice (PK mayor a la última indexada) se comparan con
+    LIKE por palabra hasta el siguiente refresco; las ediciones entran con
+    la pasada completa. Solo sin índice (no listo, sin PK o caído) se usa
+    LIKE '%palabra%' sobre cada columna.
+    """
+    resultado = None
+    if indice_texto is not None and clave_primaria_opcional() is not None:
+        try:
+            resultado = indice_texto.buscar(palabra)
+        except sqlite3.Error as e:
+            app.logger.warning("Índice de texto no disponible: %s", e)
+    if resultado is None:
+        return _like_todas(columnas, palabra)
+
+    candidatos, ultima_pk = resultado
+    pk = obtener_clave_primaria()
+    partes, valores = [], []
+    if len(candidatos) > INDICE_IN_MAX:
+        # Un solo parámetro JSON en vez de miles de marcadores (MySQL 8 / MariaDB 10.6)
+        tipo = "BIGINT" if "int" in tipos_columnas_cache.get(pk, "") else "VARCHAR(255)"
+        partes.append(f"{qc(pk)} IN (SELECT c.pk FROM JSON_TABLE(%s, '$[*]' COLUMNS (pk {tipo} PATH '$')) AS c)")
+        valores.append(json.dumps(candidatos))
+    elif candidatos:
+        partes.append(f"{qc(pk)} IN ({', '.join(['%s'] * len(candidatos))})")
+        valores.extend(candidatos)
+
+    nuevas, valores_nuevas = [], []
+    for token in tokens(palabra):
+        condicion, vals = _like_todas(columnas, token)
+        nuevas.append(condicion)
+        valores_nuevas.extend(vals)
+    if ultima_pk is not None:
+        nuevas.insert(0, f"{qc(pk)} > %s")
+        valores_nuevas.insert(0, ultima_pk)
+    partes.append("(" + " AND ".join(nuevas) + ")")
+    valores.extend(valores_nuevas)
+    return "(" + " OR ".join(partes) + ")", valores
+
+def columnas_indice() -> list[str]:
+    """Todas las columnas salvo la PK (que va primera en cada fila): como el LIKE de __todas__."""
+    pk = obtener_clave_primaria()
+    return [c for c in obtener_columnas() if c != pk]
+
+def _lotes_indice(desde):
+    # Cada fila se indexa como texto completo, PK incluida (números y fechas con str())
+    for filas in recorrer_por_llave(columnas_indice(), desde, INDICE_LOTE):
+        yield ([f[0] for f in filas],
+               [" ".join(str(v) for v in f if v is not None) for f in filas])
+
+def _hilo_indice_texto():
+    """
+    Refresca el índice: incremental por PK (filas nuevas) y completo para
+    ediciones y borrados: cada INDICE_COMPLETO_INTERVALO, cuando cambian
+    las columnas, o cuando cambió la versión de los datos desde la última
+    pasada completa (como mucho cada INDICE_EDICIONES_INTERVALO). Con la
+    versión por conteo (sin UPDATE_TIME) las ediciones no la mueven.
+    """
+    while True:
+        try:
+            ahora = time.time()
+            firma = ",".join(columnas_indice())
+            version = version_actual()
+            ultimo_completo = indice_texto.completo_en()
+            completo = (
+                ultimo_completo is None
+                or ahora - ultimo_completo > INDICE_COMPLETO_INTERVALO
+                or indice_texto.meta("columnas") != firma
+                or (version is not None and version != indice_texto.meta("version")
+                    and ahora - ultimo_completo > INDICE_EDICIONES_INTERVALO)
+            )
+            meta = {"columnas": firma, "version": version or ""} if completo else None
+            cambiadas = indice_texto.refrescar(_lotes_indice, completo, ahora, meta)
+            if cambiadas:
+                app.logger.info("Índice de texto: %d filas actualizadas (%s)", cambiadas, "completo" if completo else "incremental")
+        except RuntimeError as e:
+            # Sin clave primaria no hay índice (se usa siempre el LIKE)
+            app.logger.warning("Índice de texto detenido: %s", e)
+            return
+        except Exception as e:
+            app.logger.warning("Refresco del índice de texto falló: %s", e)
+        time.sleep(INDICE_INTERVALO)
+
+if indice_texto is not None:
+    al_arrancar(lambda: threading.Thread(target=_hilo_indice_texto, name="indice-texto", daemon=True).start())
+
+# ===============================
+# FACETAS DEL FORMULARIO (CON CONTEO)
+# ===============================
+FACETAS_TTL = int(os.getenv("FACETAS_TTL", "600"))  # seg
+FACETAS_REVISION = int(os.getenv("FACETAS_REVISION", "30"))  # seg entre revisiones en segundo plano; 0 = sin hilo
+
+# variable de la plantilla → columna
+FACETAS = {
+    'municipios': 'Municipio',
+    'proyectos': 'Proyecto',
+    'especies': 'Nombre_cientifico',
+    'grupos_biologicos': 'Grupo_Biologico',
+    'tipos_hidrobiota': 'Tipo_Hidrobiota',
+}
+
+def cargar_facetas() -> dict:
+    """
+    Las cinco listas con su conteo: un GROUP BY por faceta, las cinco a la
+    vez por el pool async (la carga tarda lo que la faceta más lenta).
+    """
+    consultas = [
+        (f"SELECT {qc(columna)}, COUNT(*) FROM {FULL_TABLE} "
+         f"WHERE {qc(columna)} IS NOT NULL GROUP BY {qc(columna)} ORDER BY 1", ())
+        for columna in FACETAS.values()
+    ]
+
+    def consultar():
+        resultados = consultar_metadatos(consultas)
+        return {faceta: [(valor, n) for valor, n in filas] for faceta, filas in zip(FACETAS, resultados)}
+
+    # Vía la caché compartida: un solo worker recorre la tabla por versión de los datos
+    return con_cache("facetas", [sql for sql, _ in consultas], consultar)
+
+# Las listas largas no van en la página: los selectores las piden a /api/sugerencias
+SUGERENCIAS = {'municipio': 'municipios', 'proyecto': 'proyectos', 'especie': 'especies'}
+SUGERENCIAS_POR_PAGINA = int(os.getenv("SUGERENCIAS_POR_PAGINA", "20"))
+indice_sugerencias = IndiceSugerencias(SUGERENCIAS)
+
+servicio_facetas = ServicioFacetas(cargar_facetas, version_actual, FACETAS_TTL, FACETAS_REVISION or 30)
+servicio_facetas.al_recargar(indice_sugerencias.reconstruir)
+if FACETAS_REVISION > 0:
+    al_arrancar(lambda: servicio_facetas.iniciar(lambda e: app.logger.warning("Recarga de facetas falló: %s", e)))
+
+def estado_caches_derivadas() -> str:
+    """
+    Para el ETag (condicional): versión con la que se cargaron las facetas y
+    el autocompletado, y última PK / pasada completa del índice de texto.
+    """
+    partes = [str(servicio_facetas.version_cargada())]
+    if indice_texto is not None:
+        try:
+            partes += [str(indice_texto.ultima_pk()), str(indice_texto.completo_en())]
+        except sqlite3.Error:
+            partes.append("sin-indice")  # con el índice caído se usa el LIKE
+    return "|".join(partes)
+
+# ==========================================
+# ASESOR DE ÍNDICES DE LOS FILTROS
+# ==========================================
+INDICES_ASESOR = os.getenv("INDICES_ASESOR", "1") == "1"  # revisar índices al arrancar
+
+def _consultar_dicts(sql: str, valores) -> list[dict]:
+    with conexion_bd() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, valores)
+        filas = cursor.fetchall()
+        cursor.close()
+    return filas
+
+def _hilo_asesor_indices():
+    """Una pasada al arrancar: avisa en el log qué filtros por igualdad no tienen índice."""
+    try:
+        obtener_columnas()
+        filtros = {campo: (col, 'igualdad') for campo, col in FILTROS_FACETA.items() if col in tipos_columnas_cache}
+        filtros.update({campo: (col, 'subcadena') for campo, col in FILTROS_TEXTO.items() if col in tipos_columnas_cache})
+        for d in diagnosticar(_consultar_dicts, FULL_TABLE, filtros):
+            estimacion = f"~{d.filas_estimadas:,} filas" if d.filas_estimadas is not None else "filas desconocidas"
+            if d.sin_indice:
+                app.logger.warning(
+                    "Filtro %s (%s) sin índice utilizable: EXPLAIN estima %s (acceso %s). Sugerencia: %s",
+                    d.campo, d.columna, estimacion, d.acceso,
+                    sugerencia_indice(FULL_TABLE, d.columna, tipos_columnas_cache.get(d.columna, "")),
+                )
+            elif d.modo == 'igualdad':
+                app.logger.info("Filtro %s (%s) usa el índice %s: EXPLAIN estima %s",
+                                d.campo, d.columna, d.indice, estimacion)
+            else:
+                app.logger.info("Filtro %s (%s) busca por subcadena (sin índice posible): EXPLAIN estima %s",
+                                d.campo, d.columna, estimacion)
+    except Exception as e:
+        app.logger.warning("Asesor de índices falló: %s", e)
+
+if INDICES_ASESOR:
+    al_arrancar(lambda: threading.Thread(target=_hilo_asesor_indices, name="asesor-indices", daemon=True).start())
+
+@app.template_filter('miles')
+def formato_miles(n) -> str:
+    """12345 → '12.345'"""
+    return f"{n:,}".replace(",", ".")
+
+# ===============================
+# RUTA PRINCIPAL "/"
+# ===============================
+@app.route('/')
+@condicional
+def index():
+    with fase("facetas"):
+        facetas = servicio_facetas.obtener()
+    with fase("render"):
+        return render_template(
+            'index.html',
+            columnas=obtener_columnas(),
+            **{faceta: valores for faceta, valores in facetas.items() if faceta not in SUGERENCIAS.values()},
+            **brand_vars()
+        )
 
 # ===============================
 # RUTA "/columnas"
 # ===============================
 @app.route("/columnas")
+@condicional
 def columnas():
     return jsonify({"columnas": obtener_columnas()})
 
+# ===============================
+# RUTA "/api/sugerencias" (AUTOCOMPLETADO)
+# ===============================
+@app.route('/api/sugerencias')
+@condicional
+def api_sugerencias():
+    """
+    ?campo=especie|municipio|proyecto&q=<prefijo>&pagina=N, en el formato de
+    Select2 (results + pagination.more). Sin tildes ni mayúsculas; el prefijo
+    puede ser el de cualquier palabra del valor.
+    """
+    campo = request.args.get('campo', '')
+    if campo not in SUGERENCIAS:
+        return jsonify({"error": f"campo debe ser uno de: {', '.join(SUGERENCIAS)}"}), 400
+    pagina = request.args.get('pagina', 1, type=int) or 1
+    with fase("facetas"):
+        if not indice_sugerencias.listo():
+            servicio_facetas.obtener()  # arranque en frío: la carga reconstruye el índice
+    with fase("sugerencias"):
+        valores, hay_mas = indice_sugerencias.buscar(
+            campo, request.args.get('q', '')[:100], pagina, SUGERENCIAS_POR_PAGINA
+        )
+    return jsonify({
+        "results": [{"id": valor, "text": f"{valor} ({formato_miles(n)})"} for valor, n in valores],
+        "pagination": {"more": hay_mas},
+    })
+
 # ======================================
 # RUTA "/buscar" (BÚSQUEDA DE REGISTROS)
 # ======================================
 @app.route('/buscar', methods=['POST'])
 def buscar():
-    limpiar_archivos_antiguos()
-
     # ---------- Captura de filtros ----------
     palabra_clave = request.form.get('palabra', '').strip()
     columna_clave = request.form.get('columna', '')
-    municipio = request.form.get('filtro_municipio')
-    proyecto = request.form.get('filtro_proyecto')
-    nombre_comun = request.form.get('filtro_nombre_comun')
-    nombre_cientifico = request.form.get('filtro_especie')
-    codigo_de_muestra = request.form.get('codigo_de_muestra')
-    grupo_biologico = request.form.get('filtro_grupo_biologico')
-    tipo_hidrobiota = request.form.get('filtro_tipo_hidrobiota')
-    columnas_mostrar = request.form.getlist('columnas_mostrar')
+    spec = capturar_filtros(request.form)
 
     # ---------- Columnas ----------
-    columnas_disponibles = obtener_columnas()
-
-    # columnas clave que siempre incluimos en la exportación
-    columnas_clave = [
-        'Nombre_cientifico',
-        'Nombre_comun',
-        'Codigo_de_muestra',
-        'Proyecto',
-        'Fecha_de_colecta'
-    ]
+    columnas_mostrar, _ = resolver_columnas(spec)
 
-    # Si no se seleccionaron o pidieron __todas__
-    if '__todas__' in columnas_mostrar or not columnas_mostrar:
-        columnas_mostrar = columnas_disponibles.copy()
-    else:
-        columnas_mostrar = list(set(columnas_mostrar + columnas_clave))
+    # ---------- Conteo ----------
+    # Las filas se piden por páginas (/api/buscar) y los puntos por vista
+    # del mapa (/api/puntos); aquí solo hace falta el total.
+    with fase("filtros"):
+        where_sql, valores = construir_where(spec)
+    with fase("conteo"):
+        total_registros = contar_registros(where_sql, valores)
 
-    # Validamos contra columnas reales (respeta el orden de la tabla)
-    columnas_mostrar = [col for col in columnas_disponibles if col in columnas_mostrar]
-
-    # Columnas mínimas necesarias para procesamiento (mapa y popups)
-    columnas_min_proc = {
-        'Latitud_decimal', 'Longitud_decimal', 'Codigo_EPSG_decimal',
-        'Nombre_cientifico', 'Nombre_comun', 'Codigo_de_muestra', 'Proyecto', 'Fecha_de_colecta'
+    # =======================================
+    # CONSULTA GUARDADA PARA EXPORTACIÓN
+    # =======================================
+    # Las exportaciones ya no se generan aquí: solo guardamos la consulta
+    # normalizada y /exportar_* la re-ejecuta en streaming si se pide.
+    # Columnas finales de exportación (alineadas entre CSV y Excel)
+    include_map = EXPORT_INCLUDE_MAP
+    export_columnas = columnas_mostrar.copy()
+    if include_map and {COL_LAT, COL_LON, COL_EPSG} <= set(obtener_columnas()):
+        # Se agregan si la tabla tiene coordenadas de origen y no están ya en la lista
+        for col in ('Latitud_mapa', 'Longitud_mapa'):
+            if col not in export_columnas:
+                export_columnas.append(col)
+
+    session['export_spec'] = {
+        'filtros': spec,
+        'columnas': export_columnas,
+        'timestamp': datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'total': total_registros,
+        'vista_previa': es_vista_previa(total_registros),
     }
-    columnas_requeridas = set(columnas_mostrar) | columnas_min_proc
-    # Selección final respetando el orden real de la tabla
-    columnas_select = [c for c in columnas_disponibles if c in columnas_requeridas]
 
-    # Helper para citar columnas con backticks
-    def qc(col: str) -> str:
-        return f"`{col}`"
+    with fase("render"):
+        return render_template(
+            'results.html',
+            total_registros=total_registros,
+            columnas_mostrar=columnas_mostrar,
+            columnas_csv=columnas_mostrar,
+            palabra=palabra_clave,
+            columna=columna_clave,
+            filtros=spec,
+            tamano_pagina=API_TAMANO_PAGINA,
+            vista_previa=es_vista_previa(total_registros),
+            vista_previa_filas=VISTA_PREVIA_FILAS,
+            vista_previa_puntos=VISTA_PREVIA_PUNTOS,
+            **brand_vars()
+        )
 
-    # ---------- Construcción del SQL ----------
-    conn = cnxpool.get_connection()
-    cursor = conn.cursor(dictionary=True)
+# ============================================
+# RUTA "/api/buscar" (PAGINACIÓN POR LLAVE)
+# ============================================
+API_TAMANO_PAGINA = int(os.getenv("API_TAMANO_PAGINA", "10"))
+API_TAMANO_MAX = int(os.getenv("API_TAMANO_MAX", "500"))
+
+# El cursor es la última PK entregada, firmado y atado a la consulta
+_cursor_signer = URLSafeSerializer(app.secret_key, salt="cursor-buscar")
+
+def _valor_celda(val):
+    """Valor JSON-seguro para una celda (fechas, Decimal, etc. → texto)."""
+    if val is None or isinstance(val, (str, int, float, bool)):
+        return val
+    return str(val)
+
+def columnas_tabla(columnas_mostrar: list[str]) -> list[str]:
+    """Columnas de la tabla de resultados (igual que los encabezados de results.html)."""
+    columnas = list(columnas_mostrar)
+    if 'Latitud_decimal' not in columnas_mostrar:
+        columnas.append('Latitud_mapa')
+    if 'Longitud_decimal' not in columnas_mostrar:
+        columnas.append('Longitud_mapa')
+    return columnas
+
+@app.route('/api/buscar')
+@condicional
+def api_buscar():
+    """
+    Misma búsqueda que /buscar pero por páginas:
+    ?<filtros>&tamano=N&cursor=<token>&total=1
+    Usa WHERE pk > último ORDER BY pk LIMIT N, así el costo de cada
+    página no depende de cuántas filas coinciden. En vista previa solo se
+    navegan las primeras VISTA_PREVIA_FILAS filas.
+    """
+    spec = capturar_filtros(request.args)
+    try:
+        pk = obtener_clave_primaria()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
 
-    # SELECT explícito para evitar confusiones de columnas
+    try:
+        tamano = int(request.args.get('tamano', API_TAMANO_PAGINA))
+    except ValueError:
+        tamano = API_TAMANO_PAGINA
+    tamano = max(1, min(tamano, API_TAMANO_MAX))
+
+    firma = firma_consulta(spec)
+    ultimo = None
+    servidas = 0  # filas entregadas antes de esta página
+    token = request.args.get('cursor')
+    if token:
+        try:
+            datos_cursor = _cursor_signer.loads(token)
+        except BadSignature:
+            return jsonify({"error": "Cursor inválido"}), 400
+        if datos_cursor.get("q") != firma:
+            return jsonify({"error": "El cursor no corresponde a esta búsqueda"}), 400
+        ultimo = datos_cursor.get("k")
+        servidas = datos_cursor.get("n", 0)
+
+    columnas_mostrar, columnas_select = resolver_columnas(spec)
+    if pk not in columnas_select:
+        columnas_select = [pk] + columnas_select
+    with fase("filtros"):
+        where_sql, valores = construir_where(spec)
+
+    total = None
+    if request.args.get('total') == '1':
+        with fase("conteo"):
+            total = contar_registros(where_sql, valores)
+
+    # Sin total=1 el conteo (de la caché) solo hace falta si la página pasa del límite
+    limite = None
+    if total is not None or servidas + tamano > VISTA_PREVIA_FILAS:
+        if total is None:
+            with fase("conteo"):
+                total_real = contar_registros(where_sql, valores)
+        else:
+            total_real = total
+        if es_vista_previa(total_real):
+            limite = VISTA_PREVIA_FILAS
+            tamano = max(0, min(tamano, limite - servidas))
+
+    pagina_sql = where_sql
+    pagina_valores = list(valores)
+    if ultimo is not None:
+        pagina_sql += f" AND {qc(pk)} > %s"
+        pagina_valores.append(ultimo)
     select_cols_sql = ", ".join(qc(c) for c in columnas_select)
-    query = f"SELECT {select_cols_sql} FROM {FULL_TABLE} WHERE 1=1"
-    filtros = []
-    valores = []
-
-    if municipio:
-        filtros.append("Municipio LIKE %s")
-        valores.append(f"%{municipio}%")
-    if proyecto:
-        filtros.append("Proyecto LIKE %s")
-        valores.append(f"%{proyecto}%")
-    if nombre_comun:
-        filtros.append("Nombre_comun LIKE %s")
-        valores.append(f"%{nombre_comun}%")
-    if nombre_cientifico:
-        filtros.append("Nombre_cientifico LIKE %s")
-        valores.append(f"%{nombre_cientifico}%")
-    if codigo_de_muestra:
-        filtros.append("Codigo_de_muestra LIKE %s")
-        valores.append(f"%{codigo_de_muestra}%")
-    if grupo_biologico:
-        filtros.append("Grupo_Biologico LIKE %s")
-        valores.append(f"%{grupo_biologico}%")
-    if tipo_hidrobiota:
-        filtros.append("Tipo_Hidrobiota LIKE %s")
-        valores.append(f"%{tipo_hidrobiota}%")
-    if palabra_clave:
-        if columna_clave and columna_clave != "__todas__" and columna_clave in columnas_disponibles:
-            filtros.append(f"{qc(columna_clave)} LIKE %s")
-            valores.append(f"%{palabra_clave}%")
-        elif columna_clave == "__todas__" and columnas_disponibles:
-            subfiltros = [f"{qc(col)} LIKE %s" for col in columnas_disponibles]
-            filtros.append("(" + " OR ".join(subfiltros) + ")")
-            valores.extend([f"%{palabra_clave}%"] * len(columnas_disponibles))
-
-    if filtros:
-        query += " AND " + " AND ".join(filtros)
-
-    cursor.execute(query, valores)
-    resultados = cursor.fetchall()
-
-    # ===============================
-    # TRANSFORMACIÓN DE COORDENADAS
-    # ===============================
-    transformadores: dict[str, Transformer] = {}
-    coordenadas = []
+    columnas = columnas_tabla(columnas_mostrar)
+
+    def leer_pagina():
+        if not tamano:
+            return {"filas": [], "cursor_siguiente": None, "coordenadas_fallidas": 0}
+        with conexion_bd() as conn:
+            cursor = conn.cursor()
+            with fase("consulta"):
+                cursor.execute(
+                    f"SELECT {select_cols_sql} FROM {FULL_TABLE} {pagina_sql} ORDER BY {qc(pk)} LIMIT %s",
+                    pagina_valores + [tamano + 1]
+                )
+            with fase("fetch"):
+                filas = cursor.fetchall()
+                esquema = Esquema(cursor.column_names)
+            cursor.close()
+        medicion_actual().contar("filas", len(filas))
+
+        # Pedimos una fila de más para saber si hay página siguiente
+        hay_siguiente = len(filas) > tamano
+        if limite is not None and servidas + tamano >= limite:
+            hay_siguiente = False
+        lote = Lote.desde_tuplas(esquema, filas[:tamano])
+        with fase("reproyeccion"):
+            resumen_coords = transformar_coordenadas(lote)
+
+        cursor_siguiente = None
+        if hay_siguiente:
+            cursor_siguiente = _cursor_signer.dumps(
+                {"q": firma, "k": _valor_celda(lote[-1][pk]), "n": servidas + len(lote)}
+            )
+        return {
+            "filas": [[_valor_celda(v) for v in valores] for valores in lote.tuplas(columnas, None)],
+            "cursor_siguiente": cursor_siguiente,
+            "coordenadas_fallidas": resumen_coords.fallidas,
+        }
+
+    pagina = con_cache("pagina", [firma, select_cols_sql, pagina_sql, pagina_valores, tamano, columnas, limite],
+                       leer_pagina)
+    return jsonify({
+        "columnas": columnas,
+        "filas": pagina["filas"],
+        "tamano": tamano,
+        "cursor_siguiente": pagina["cursor_siguiente"],
+        "total": total,
+        "limite_vista_previa": limite,
+        "coordenadas_fallidas": pagina["coordenadas_fallidas"],
+    })
+
+# ============================================
+# RUTA "/api/puntos" (PUNTOS DEL MAPA POR VISTA)
+# ============================================
+PUNTOS_MAX = int(os.getenv("PUNTOS_MAX", "5000"))  # puntos sueltos por respuesta
+CLUSTER_RADIO_PX = int(os.getenv("CLUSTER_RADIO_PX", "60"))  # tamaño de celda en píxeles
+CLUSTER_ZOOM_MAX = int(os.getenv("CLUSTER_ZOOM_MAX", "16"))  # desde aquí no se agrupa
+conjuntos_puntos = CacheConjuntos(int(os.getenv("PUNTOS_CACHE_BUSQUEDAS", "8")))
+
+def construir_conjunto_puntos(where_sql: str, valores: list, paso: int = 1) -> ConjuntoPuntos:
+    """
+    Lee solo PK, coordenadas de origen y campos del popup; reproyecta vía la
+    caché. Con paso > 1 conserva una fila de cada `paso` antes de reproyectar.
+    """
+    pk = clave_primaria_opcional()
+    columnas_disponibles = obtener_columnas()
+    popup = [c for c in CAMPOS_POPUP if c in columnas_disponibles]
+    columnas = ([pk] if pk else []) + [COL_LAT, COL_LON, COL_EPSG] + popup
 
-    for fila in resultados:
+    resumen = ResumenReproyeccion()
+    sumidero = SumideroPuntos(popup, _valor_celda)
+    medicion = medicion_actual()
+    with conexion_bd() as conn:
+        cursor = conn.cursor()
         try:
-            lat = str(fila.get('Latitud_decimal', '')).replace(',', '.')
-            lon = str(fila.get('Longitud_decimal', '')).replace(',', '.')
-            epsg = fila.get('Codigo_EPSG_decimal')
-            if lat and lon and epsg:
-                lat = float(lat); lon = float(lon)
-                if epsg not in transformadores:
-                    transformadores[epsg] = Transformer.from_crs(
-                        f"EPSG:{epsg}", "EPSG:4326", always_xy=True
-                    )
-                lon_wgs84, lat_wgs84 = transformadores[epsg].transform(lon, lat)
-                # NO sobrescribir los valores decimales originales (proyectados)
-                fila['Longitud_mapa'] = lon_wgs84
-                fila['Latitud_mapa'] = lat_wgs84
-                coordenadas.append({
-                    'lat': lat_wgs84,
-                    'lon': lon_wgs84,
-                    'Nombre_cientifico': fila.get('Nombre_cientifico') or 'No disponible',
-                    'Nombre_comun': fila.get('Nombre_comun') or 'No disponible',
-                    'Codigo_de_muestra': fila.get('Codigo_de_muestra') or 'No disponible',
-                    'Proyecto': fila.get('Proyecto') or 'No disponible',
-                    'Fecha_de_colecta': fila.get('Fecha_de_colecta') or 'No disponible'
-                })
-        except:
-            fila['Latitud_mapa'] = None
-            fila['Longitud_mapa'] = None
-
-    # =======================================
-    # EXPORTACIÓN DE RESULTADOS A CSV Y EXCEL
-    # =======================================
-    # Columnas finales de exportación (alineadas entre CSV y Excel)
-    include_map = os.getenv("EXPORT_INCLUDE_MAP_COORDS", "1") == "1"
-    export_columnas = columnas_mostrar.copy()
-    if include_map:
-        # Solo agregamos si existen coordenadas calculadas y no están ya en la lista
-        if any(f.get('Latitud_mapa') is not None for f in resultados):
-            if 'Latitud_mapa' not in export_columnas:
-                export_columnas.append('Latitud_mapa')
-        if any(f.get('Longitud_mapa') is not None for f in resultados):
-            if 'Longitud_mapa' not in export_columnas:
-                export_columnas.append('Longitud_mapa')
-
-    export_id = str(uuid.uuid4())
-    timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S')
-    csv_path = os.path.join(app.config['EXPORT_FOLDER'], f"{export_id}.csv")
-    xlsx_path = os.path.join(app.config['EXPORT_FOLDER'], f"{export_id}.xlsx")
-
-    # =====================
-    # EXPORTACIÓN A CSV
-    # =====================
-    add_bom = os.getenv("CSV_ADD_BOM", "1") == "1"
-    delimiter = os.getenv("CSV_DELIMITER", ",")
-    quoting_mode = csv.QUOTE_MINIMAL
-    fecha_cols = {c for c in export_columnas if 'fecha' in c.lower()}
-    total_registros = len(resultados)
-    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-        if add_bom:
-            f.write('\ufeff')
-        # Línea de metadatos inicial
-        f.write(f"# total_registros: {total_registros}\n")
-        writer = csv.DictWriter(
-            f,
-            fieldnames=export_columnas,
-            delimiter=delimiter,
-            quoting=quoting_mode
-        )
-        writer.writeheader()
-        for fila in resultados:
-            out_row = {}
-            for col in export_columnas:
-                val = fila.get(col, '')
-                if col in fecha_cols and isinstance(val, str):
-                    parsed = None
-                    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y"):
-                        try:
-                            parsed = datetime.strptime(val, fmt)
-                            break
-                        except Exception:
-                            pass
-                    if parsed:
-                        val = parsed.strftime('%Y-%m-%d')
-                out_row[col] = val
-            writer.writerow(out_row)
-
-    # =====================
-    # EXPORTACIÓN A EXCEL
-    # =====================
-    wb = Workbook()
-    ws = cast(Worksheet, wb.active)
-    ws.title = "Datos"
-    ws.append(export_columnas)
-
-    for fila in resultados:
-        row_values = []
-        for col in export_columnas:
-            val = fila.get(col, '')
-            if col in fecha_cols and isinstance(val, str):
-                parsed = None
-                for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y"):
-                    try:
-                        parsed = datetime.strptime(val, fmt)
-                        break
-                    except Exception:
-                        pass
-                if parsed:
-                    val = parsed
-            row_values.append(val)
-        ws.append(row_values)
-
-    header_fill_color = os.getenv('EXCEL_HEADER_FILL', '18263f')
-    header_font_color = os.getenv('EXCEL_HEADER_FONT', 'e6ebff')
-    for cell in ws[1]:
-        cell.font = Font(bold=True, color=header_font_color)
-        cell.fill = PatternFill(start_color=header_fill_color, end_color=header_fill_color, fill_type="solid")
-    ws.freeze_panes = "A2"
-    ws.auto_filter.ref = ws.dimensions
-    max_width = int(os.getenv('EXCEL_MAX_COL_WIDTH', '60'))
-    for idx, col_cells in enumerate(ws.columns, start=1):
-        max_len = 0
-        for c in col_cells:
-            val = c.value
-            if val is None:
-                length = 0
-            elif isinstance(val, datetime):
-                length = len(val.strftime('%Y-%m-%d'))
-            else:
-                length = len(str(val))
-            if length > max_len:
-                max_len = length
-        adjusted = min(max_len + 2, max_width)
-        ws.column_dimensions[get_column_letter(idx)].width = adjusted
-    for col in fecha_cols:
+            with medicion.fase("consulta"):
+                cursor.execute(f"SELECT {', '.join(qc(c) for c in columnas)} FROM {FULL_TABLE} {where_sql}", valores)
+            (Flujo(lotes_cursor(cursor, EXPORT_LOTE, medicion), medicion)
+                .etapa("muestreo", muestreo_uniforme(paso))
+                .etapa("reproyeccion", lambda lote: resumen.sumar(transformar_coordenadas(lote)))
+                .volcar(sumidero))
+        finally:
+            cursor.close()
+    conjunto = sumidero.conjunto
+    conjunto.total_filas = resumen.total
+    conjunto.fallidas = resumen.fallidas
+    conjunto.paso = paso
+    registrar_reproyeccion(resumen, "puntos")
+    return conjunto
+
+def cargar_conjunto_puntos(spec: dict) -> ConjuntoPuntos:
+    """ConjuntoPuntos desde la caché compartida (o MySQL) con su clusterizador."""
+    where_sql, valores = construir_where(spec)
+    # En vista previa el mapa usa una muestra pareja de ~VISTA_PREVIA_PUNTOS filas
+    total = contar_registros(where_sql, valores)
+    paso = -(-total // VISTA_PREVIA_PUNTOS) if es_vista_previa(total) and VISTA_PREVIA_PUNTOS > 0 else 1
+    conjunto = con_cache("puntos", [where_sql, valores, paso],
+                         lambda: construir_conjunto_puntos(where_sql, valores, paso))
+    conjunto.clusterizador = Clusterizador(conjunto, CLUSTER_RADIO_PX, CLUSTER_ZOOM_MAX)
+    return conjunto
+
+@app.route('/api/puntos')
+@condicional
+def api_puntos():
+    """
+    Puntos WGS84 de una búsqueda dentro de la vista del mapa:
+    ?<filtros>&bbox=oeste,sur,este,norte&zoom=z
+    Con zoom se devuelven clusters agregados en el servidor más los puntos
+    sueltos; sin bbox se incluyen los límites de todos los puntos (fitBounds).
+    """
+    spec = capturar_filtros(request.args)
+    bbox = None
+    if request.args.get('bbox'):
         try:
-            idx = export_columnas.index(col) + 1
-            for r in range(2, ws.max_row + 1):
-                cell = ws.cell(row=r, column=idx)
-                if isinstance(cell.value, datetime):
-                    cell.number_format = 'YYYY-MM-DD'
+            bbox = [float(v) for v in request.args['bbox'].split(',')]
         except ValueError:
+            bbox = []
+        if len(bbox) != 4:
+            return jsonify({"error": "bbox debe ser oeste,sur,este,norte"}), 400
+    zoom = request.args.get('zoom', type=int)
+
+    spec.pop('columnas_mostrar', None)  # no cambian los puntos
+    clave = f"{firma_consulta(spec)}:{version_actual()}"  # otra versión de los datos → otro conjunto
+    with fase("conjunto"):
+        conjunto = conjuntos_puntos.obtener(clave, lambda: cargar_conjunto_puntos(spec))
+    with fase("clusters"):
+        if zoom is None:
+            clusters = []
+            indices = conjunto.en_bbox(*bbox) if bbox else list(range(len(conjunto)))
+        else:
+            clusters, indices = conjunto.clusterizador.consultar(zoom, bbox)
+    en_vista = len(indices) + sum(c["n"] for c in clusters)
+    sueltos = muestrear(indices, PUNTOS_MAX)
+    campos = conjunto.campos
+    return jsonify({
+        "total": len(conjunto),
+        "muestra_paso": conjunto.paso,
+        "fallidas": conjunto.fallidas,
+        "limites": conjunto.limites(),
+        "en_vista": en_vista,
+        "truncado": len(sueltos) < len(indices),
+        "clusters": clusters,
+        "puntos": [
+            {"lat": conjunto.lat[i], "lon": conjunto.lon[i], **dict(zip(campos, conjunto.info[i]))}
+            for i in sueltos
+        ],
+    })
+
+# ==========================================
+# EXPORTACIÓN EN STREAMING DESDE LA CONSULTA
+# ==========================================
+EXPORT_INCLUDE_MAP = os.getenv("EXPORT_INCLUDE_MAP_COORDS", "1") == "1"
+EXPORT_LOTE = int(os.getenv("EXPORT_LOTE", "2000"))  # filas por fetchmany
+EXCEL_MUESTRA_ANCHO = int(os.getenv("EXCEL_MUESTRA_ANCHO", "1000"))  # filas para calcular anchos
+def _consulta_exportacion(export_spec: dict) -> tuple[str, list]:
+    """Re-arma el SELECT de la búsqueda guardada en sesión."""
+    _, columnas_select = resolver_columnas(export_spec['filtros'])
+    # La PK permite reutilizar la caché de coordenadas
+    pk = clave_primaria_opcional()
+    if pk and pk not in columnas_select:
+        columnas_select = [pk] + columnas_select
+    where_sql, valores = construir_where(export_spec['filtros'])
+    select_cols_sql = ", ".join(qc(c) for c in columnas_select)
+    return f"SELECT {select_cols_sql} FROM {FULL_TABLE} {where_sql}", valores
+
+def _lotes_exportacion(query: str, valores: list, medicion: Medicion):
+    """
+    Recorre la consulta con un cursor sin buffer (fetchmany por lotes) en una
+    conexión dedicada: la descarga puede tardar y no debe ocupar el pool.
+    La memoria queda acotada por EXPORT_LOTE, no por el total de filas.
+    """
+    with medicion.fase("conexion"):
+        conn = mysql.connector.connect(**dbconfig)
+    cursor = conn.cursor(buffered=False)
+    try:
+        with medicion.fase("consulta"):
+            cursor.execute(query, valores)
+        yield from lotes_cursor(cursor, EXPORT_LOTE, medicion)
+    finally:
+        # Si el cliente corta la descarga quedan filas sin leer: cerramos la conexión
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
             pass
-    # Hoja resumen
-    resumen = wb.create_sheet(title="Resumen")
-    resumen.append(["Campo", "Valor"])
-    resumen.append(["total_registros", total_registros])
-    resumen.append(["fecha_exportacion", timestamp_str])
-    resumen.append(["columnas", ",".join(export_columnas)])
-    resumen.append(["incluir_coord_mapa", "si" if include_map else "no"])
-    # Estilo simple para encabezado resumen
-    resumen["A1"].font = Font(bold=True)
-    resumen["B1"].font = Font(bold=True)
-    wb.save(xlsx_path)
-
-    # Guardar rutas en sesión (Flask session SOLO para paths de exportación)
-    session['csv_export_path'] = csv_path
-    session['excel_export_path'] = xlsx_path
-    session['export_columnas'] = export_columnas
-    session['export_timestamp'] = timestamp_str
-
-    cursor.close()
-    conn.close()
-
-    return render_template(
-        'results.html',
-        resultados=resultados,
-        columnas_mostrar=columnas_mostrar,
-        columnas_csv=columnas_mostrar,
-        palabra=palabra_clave,
-        columna=columna_clave,
-        coordenadas=coordenadas,
-        **brand_vars()
+
+def flujo_exportacion(export_spec: dict, medicion: Medicion) -> Flujo:
+    """Lotes de la búsqueda guardada, reproyectados y con las fechas normalizadas, listos para los sumideros."""
+    query, valores = _consulta_exportacion(export_spec)
+    fechas = NormalizadorFechas(columnas_fecha(export_spec['columnas']))
+    return (Flujo(_lotes_exportacion(query, valores, medicion), medicion)
+            .etapa("reproyeccion", transformar_coordenadas)
+            .etapa("fechas", fechas.normalizar_lote))
+
+def _export_spec_o_error(formato: str):
+    export_spec = session.get('export_spec')
+    if not export_spec or not export_spec.get('columnas'):
+        return None, (f'No hay resultados para exportar en {formato}', 400)
+    return export_spec, None
+
+def _export_directa_o_error(formato: str):
+    """Como _export_spec_o_error, pero una búsqueda en vista previa no se exporta dentro del request."""
+    export_spec, error = _export_spec_o_error(formato)
+    if not error and export_spec.get('vista_previa'):
+        total = formato_miles(export_spec.get('total') or 0)
+        error = (f'La búsqueda devolvió {total} registros: la exportación {formato} '
+                 f'se genera en segundo plano (POST /exportar/iniciar)', 409)
+    return export_spec, error
+
+# ===================================
+# GENERACIÓN DE CSV Y EXCEL
+# ===================================
+def _sumidero_streaming(formato: str, export_spec: dict, incluir_sin_coordenadas: bool = False):
+    if formato == 'csv':
+        return SumideroCSV(
+            export_spec['columnas'],
+            delimitador=os.getenv("CSV_DELIMITER", ","),
+            bom=os.getenv("CSV_ADD_BOM", "1") == "1",
+            # Línea de metadatos inicial
+            metadatos=f"# total_registros: {export_spec.get('total', '')}\n",
+        )
+    clase = SumideroGeoJSON if formato == 'geojson' else SumideroNDJSON
+    return clase(export_spec['columnas'], columna_id=clave_primaria_opcional(),
+                 incluir_sin_coordenadas=incluir_sin_coordenadas)
+
+def generar_exportacion(formato: str, export_spec: dict, medicion: Medicion, avance=None,
+                        incluir_sin_coordenadas: bool = False):
+    """
+    Bytes de una exportación en streaming (csv, geojson o ndjson), un bloque
+    por lote de EXPORT_LOTE filas; avance(filas) tras cada lote.
+    """
+    sumidero = _sumidero_streaming(formato, export_spec, incluir_sin_coordenadas)
+    for datos in flujo_exportacion(export_spec, medicion).hacia(sumidero, avance=avance):
+        medicion.contar("bytes", len(datos))
+        yield datos
+
+def escribir_excel(export_spec: dict, destino: str, medicion: Medicion, avance=None) -> int:
+    """Arma el .xlsx completo en `destino`; devuelve el total de filas escritas."""
+    export_columnas = export_spec['columnas']
+    sumidero = SumideroExcel(
+        destino,
+        export_columnas,
+        resumen=[
+            ("fecha_exportacion", export_spec['timestamp']),
+            ("columnas", ",".join(export_columnas)),
+            ("incluir_coord_mapa", "si" if EXPORT_INCLUDE_MAP else "no"),
+        ],
+        muestra_ancho=EXCEL_MUESTRA_ANCHO,
+        ancho_max=int(os.getenv('EXCEL_MAX_COL_WIDTH', '60')),
+        color_relleno=os.getenv('EXCEL_HEADER_FILL', '18263f'),
+        color_fuente=os.getenv('EXCEL_HEADER_FONT', 'e6ebff'),
     )
+    flujo_exportacion(export_spec, medicion).volcar(sumidero, avance=avance)
+    medicion.contar("bytes", os.path.getsize(destino))
+    return sumidero.total
 
 # ===================================
 # RUTA "/exportar_csv" (DESCARGA CSV)
 # ===================================
 @app.route('/exportar_csv')
 def exportar_csv():
-    export_path = session.get('csv_export_path')
-    if not export_path or not os.path.exists(export_path):
-        return 'No hay resultados para exportar en CSV', 400
-    def generate():
-        with open(export_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                yield line
-    ts = session.get('export_timestamp', datetime.now().strftime('%Y%m%d_%H%M%S'))
-    resp = Response(generate(), mimetype='text/csv')
-    resp.headers['Content-Disposition'] = f'attachment; filename=resultados_{ts}.csv'
+    export_spec, error = _export_directa_o_error('CSV')
+    if error:
+        return error
+    # El generador corre fuera del contexto del request: se le pasa la medición
+    resp = Response(generar_exportacion('csv', export_spec, medicion_actual()), mimetype='text/csv')
+    resp.headers['Content-Disposition'] = f"attachment; filename=resultados_{export_spec['timestamp']}.csv"
+    return resp
+
+# ==================================================
+# RUTAS "/exportar_geojson" Y "/exportar_ndjson" (SIG)
+# ==================================================
+# Coordenadas WGS84 ya reproyectadas, mismas columnas que la búsqueda.
+# ?sin_coordenadas=incluir → filas sin coordenadas con "geometry": null
+# (por defecto se omiten y se listan en el resumen final).
+# La compresión la agrega comprimir_respuesta, como en /exportar_csv.
+def _exportar_geo(formato: str, nombre: str):
+    export_spec, error = _export_directa_o_error(nombre)
+    if error:
+        return error
+    incluir = request.args.get('sin_coordenadas') == 'incluir'
+    cuerpo = generar_exportacion(formato, export_spec, medicion_actual(), incluir_sin_coordenadas=incluir)
+    resp = Response(cuerpo, mimetype=MIMETYPES_EXPORTACION[formato])
+    resp.headers['Content-Disposition'] = (
+        f"attachment; filename=resultados_{export_spec['timestamp']}.{EXTENSIONES_EXPORTACION[formato]}"
+    )
     return resp
 
+@app.route('/exportar_geojson')
+def exportar_geojson():
+    return _exportar_geo('geojson', 'GeoJSON')
+
+@app.route('/exportar_ndjson')
+def exportar_ndjson():
+    return _exportar_geo('ndjson', 'NDJSON')
+
 # =======================================
 # RUTA "/exportar_excel" (DESCARGA EXCEL)
 # =======================================
+def _enviar_y_borrar(ruta: str):
+    try:
+        with open(ruta, 'rb') as f:
+            while True:
+                bloque = f.read(64 * 1024)
+                if not bloque:
+                    break
+                yield bloque
+    finally:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
 @app.route('/exportar_excel')
 def exportar_excel():
-    export_path = session.get('excel_export_path')
-    if not export_path or not os.path.exists(export_path):
-        return 'No hay resultados para exportar en Excel', 400
-    ts = session.get('export_timestamp', datetime.now().strftime('%Y%m%d_%H%M%S'))
+    export_spec, error = _export_directa_o_error('Excel')
+    if error:
+        return error
+
+    # El .xlsx es un zip: se arma en un temporal y se envía por bloques
+    with tempfile.NamedTemporaryFile(dir=app.config['EXPORT_FOLDER'], suffix='.xlsx', delete=False) as tmp:
+        xlsx_path = tmp.name
+    try:
+        escribir_excel(export_spec, xlsx_path, medicion_actual())
+    except Exception:
+        os.remove(xlsx_path)
+        raise
+
+    resp = Response(_enviar_y_borrar(xlsx_path), mimetype=MIMETYPES_EXPORTACION['excel'])
+    resp.headers['Content-Disposition'] = f"attachment; filename=resultados_{export_spec['timestamp']}.xlsx"
+    resp.headers['Content-Length'] = str(os.path.getsize(xlsx_path))
+    return resp
+
+# ==============================================
+# EXPORTACIONES EN SEGUNDO PLANO (TRABAJOS)
+# ==============================================
+EXPORT_TRABAJOS_MAX = int(os.getenv("EXPORT_TRABAJOS_MAX", "2"))        # trabajos simultáneos por worker
+EXPORT_TRABAJOS_POR_USUARIO = int(os.getenv("EXPORT_TRABAJOS_POR_USUARIO", "2"))
+EXPORT_TRABAJOS_COLA = int(os.getenv("EXPORT_TRABAJOS_COLA", "16"))     # en cola por worker
+MIMETYPES_EXPORTACION = {
+    'csv': 'text/csv',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'geojson': 'application/geo+json',
+    'ndjson': 'application/x-ndjson',
+}
+EXTENSIONES_EXPORTACION = {'csv': 'csv', 'excel': 'xlsx', 'geojson': 'geojson', 'ndjson': 'ndjson'}
+
+cola_exportaciones = ColaTrabajos(
+    os.path.join(app.config['EXPORT_FOLDER'], 'trabajos'),
+    max_concurrentes=EXPORT_TRABAJOS_MAX,
+    max_por_usuario=EXPORT_TRABAJOS_POR_USUARIO,
+    cola_max=EXPORT_TRABAJOS_COLA,
+)
+
+# Archivos terminados: índice compartido y limpieza fuera de los requests
+EXPORT_INDICE_PATH = os.getenv("EXPORT_INDICE_PATH", os.path.join("cache", "exportaciones.sqlite"))
+EXPORT_CUOTA_MB = int(os.getenv("EXPORT_CUOTA_MB", "2048"))              # disco total para exportaciones
+EXPORT_TTL = int(os.getenv("EXPORT_TTL", "3600"))                        # seg sin descargas antes de borrar
+EXPORT_LIMPIEZA_INTERVALO = int(os.getenv("EXPORT_LIMPIEZA_INTERVALO", "60"))
+
+almacen_exportaciones = AlmacenArtefactos(
+    app.config['EXPORT_FOLDER'], EXPORT_INDICE_PATH, EXPORT_CUOTA_MB * 1024 * 1024, EXPORT_TTL
+)
+almacen_exportaciones.al_borrar(cola_exportaciones.olvidar)
+
+def _hilo_limpiar_exportaciones():
+    """Borra exportaciones vencidas o fuera de cuota y los estados de trabajos viejos."""
+    while True:
+        time.sleep(EXPORT_LIMPIEZA_INTERVALO)
+        try:
+            borrados = almacen_exportaciones.limpiar_exclusivo()
+            if borrados is None:
+                continue  # otro worker está limpiando
+            cola_exportaciones.purgar(time.time() - EXPORT_TTL)
+            if borrados:
+                app.logger.info("Exportaciones: %d archivos borrados", len(borrados))
+        except Exception as e:
+            app.logger.warning("Limpieza de exportaciones falló: %s", e)
+
+if EXPORT_LIMPIEZA_INTERVALO > 0:
+    al_arrancar(lambda: threading.Thread(target=_hilo_limpiar_exportaciones, name="limpieza-exportaciones", daemon=True).start())
+
+def _usuario_exportacion() -> str:
+    """Email del SSO si hay; si no, un id aleatorio guardado en la sesión."""
+    email = getattr(g, "_svc_email", None) or getattr(g, "_set_cookie_email", None)
+    if email:
+        return email
+    if 'usuario_export' not in session:
+        session['usuario_export'] = base64.urlsafe_b64encode(os.urandom(9)).decode()
+    return session['usuario_export']
+
+def _ejecutar_exportacion(id_trabajo: str, dueno: str, formato: str, export_spec: dict):
+    """Función que corre en el hilo del trabajo: escribe a .parcial, renombra y registra el archivo."""
+    destino = os.path.join(app.config['EXPORT_FOLDER'], f"{id_trabajo}.{EXTENSIONES_EXPORTACION[formato]}")
+
+    def ejecutar(avance):
+        medicion = Medicion(metricas, f"trabajo_{formato}")
+        parcial = f"{destino}.parcial"
+        try:
+            if formato == 'excel':
+                escribir_excel(export_spec, parcial, medicion, avance)
+            else:
+                with open(parcial, 'wb') as f:
+                    for bloque in generar_exportacion(formato, export_spec, medicion, avance):
+                        f.write(bloque)
+            os.replace(parcial, destino)
+        except BaseException:
+            try:
+                os.remove(parcial)
+            except OSError:
+                pass
+            raise
+        finally:
+            medicion.cerrar()
+        return {"bytes": almacen_exportaciones.registrar(id_trabajo, dueno, formato, destino)["bytes"]}
+    return ejecutar
+
+@app.route('/exportar/iniciar', methods=['POST'])
+def exportar_iniciar():
+    """Lanza (o reutiliza) la exportación de la búsqueda en sesión: formato=csv|excel|geojson|ndjson."""
+    formato = request.form.get('formato') or request.args.get('formato', 'csv')
+    if formato not in MIMETYPES_EXPORTACION:
+        return jsonify({"error": f"formato debe ser uno de: {', '.join(MIMETYPES_EXPORTACION)}"}), 400
+    export_spec, error = _export_spec_o_error(formato.upper())
+    if error:
+        return jsonify({"error": error[0]}), error[1]
+
+    # Mismo usuario, misma consulta, mismas columnas y mismos datos → mismo trabajo.
+    # El dueño va en el id: los trabajos no se comparten entre usuarios.
+    dueno = _usuario_exportacion()
+    id_trabajo = firma_consulta({
+        'formato': formato,
+        'filtros': export_spec['filtros'],
+        'columnas': export_spec['columnas'],
+        'version': version_actual(),
+        'dueno': dueno,
+    })
+    previo = cola_exportaciones.estado(id_trabajo)
+    if previo and previo['estado'] == LISTO and almacen_exportaciones.obtener(id_trabajo, tocar=False) is None:
+        cola_exportaciones.olvidar(id_trabajo)  # el archivo ya se limpió: se genera de nuevo
+    try:
+        estado = cola_exportaciones.iniciar(
+            id_trabajo,
+            dueno,
+            _ejecutar_exportacion(id_trabajo, dueno, formato, export_spec),
+            {'formato': formato, 'total': export_spec.get('total'), 'timestamp': export_spec['timestamp']},
+        )
+    except LimiteTrabajos as e:
+        return jsonify({"error": str(e)}), 429
+    return jsonify(progreso(estado)), 202
+
+def _trabajo_del_usuario(id_trabajo: str) -> dict | None:
+    """Estado del trabajo si es del usuario actual; None (→ 404) si no existe o es de otro."""
+    estado = cola_exportaciones.estado(id_trabajo)
+    if estado is None or not hmac.compare_digest(str(estado.get('dueno') or ''), _usuario_exportacion()):
+        return None
+    return estado
+
+@app.route('/exportar/estado/<id_trabajo>')
+def exportar_estado(id_trabajo):
+    estado = _trabajo_del_usuario(id_trabajo)
+    if estado is None:
+        return jsonify({"error": "Exportación no encontrada"}), 404
+    return jsonify(progreso(estado))
+
+@app.route('/exportar/descargar/<id_trabajo>')
+def exportar_descargar(id_trabajo):
+    estado = _trabajo_del_usuario(id_trabajo)
+    if estado is None:
+        return jsonify({"error": "Exportación no encontrada"}), 404
+    if estado['estado'] != LISTO:
+        return jsonify(progreso(estado)), 409
+    artefacto = almacen_exportaciones.obtener(id_trabajo)
+    if artefacto is None:
+        cola_exportaciones.olvidar(id_trabajo)
+        return jsonify({"error": "La exportación ya no está disponible; vuelva a generarla"}), 410
+    formato = artefacto['formato']
     return send_file(
-        export_path,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        artefacto['ruta'],
+        mimetype=MIMETYPES_EXPORTACION[formato],
         as_attachment=True,
-        download_name=f'resultados_{ts}.xlsx'
+        download_name=f"resultados_{estado['timestamp']}.{EXTENSIONES_EXPORTACION[formato]}",
     )
 
+# ===============================
+# RUTA "/metrics" (PROMETHEUS)
+# ===============================
+@app.route('/metrics')
+def metricas_prometheus():
+    if METRICAS_TOKEN:
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth, f"Bearer {METRICAS_TOKEN}"):
+            return "No autorizado", 401
+    try:
+        metricas.volcar(METRICAS_DIR)
+    except OSError:
+        pass
+    # Suma de todos los workers con instantánea reciente
+    instantaneas = metricas.instantaneas_vigentes(METRICAS_DIR, METRICAS_INTERVALO * 4)
+    return Response(metricas.texto(instantaneas), mimetype='text/plain; version=0.0.4')
+
 # (Opcional) endpoint de salud
 @app.route('/health')
 def health():
     try:
-        conn = cnxpool.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return {"ok": True}
+        with conexion_bd() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+        return {"ok": True, "pool": pool_bd().estadisticas(),
+                "metadatos": metadatos_bd().estadisticas() if METADATOS_ASYNC else None,
+                "exportaciones": almacen_exportaciones.estadisticas(), "arranque": tiempos_arranque}
     except Exception as e:
         return {"ok": False, "error": str(e)}, 500
 
+# ==========================================
+# PREPARACIÓN DEL WORKER Y CALENTAMIENTO
+# ==========================================
+# Transformers que conviene tener listos: WGS84, MAGNA-SIRGAS (orígenes y CTM12) y UTM 18N
+EPSG_PRECARGA = [c.strip() for c in os.getenv("EPSG_PRECARGA", "4326,3116,3115,3117,3118,9377,32618").split(",") if c.strip()]
+
+def calentar_caches() -> None:
+    """Columnas, versión de datos, facetas (y autocompletado) y Transformers antes del primer request."""
+    etapas = (
+        ("columnas", obtener_columnas),
+        ("version_datos", version_actual),
+        ("facetas", servicio_facetas.obtener),
+        ("transformadores", lambda: precargar(EPSG_PRECARGA)),
+    )
+    for etapa, funcion in etapas:
+        t0 = time.perf_counter()
+        try:
+            resultado = funcion()
+        except Exception as e:
+            # Un calentamiento fallido no impide arrancar: esa caché se llena con el primer request
+            app.logger.warning("Calentamiento de %s falló: %s", etapa, e)
+            continue
+        if etapa == "transformadores" and resultado:
+            app.logger.warning("EPSG_PRECARGA con códigos inválidos: %s", ", ".join(resultado))
+        tiempos_arranque[etapa] = round(time.perf_counter() - t0, 3)
+
+def preparar_worker(calentar: bool = True) -> dict:
+    """
+    Una vez por proceso: arranca los hilos de fondo registrados con
+    al_arrancar() y, con calentar=True, llena las cachés. Lo llama el hook
+    post_fork de gunicorn.conf.py; sin él (flask run, gunicorn app:app) lo
+    hace el primer request, sin calentar. Devuelve los tiempos por etapa.
+    """
+    global _worker_pid
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return tiempos_arranque
+        _worker_pid = os.getpid()
+    t0 = time.perf_counter()
+    for funcion in _al_arrancar:
+        funcion()
+    if calentar:
+        calentar_caches()
+    tiempos_arranque["worker"] = round(time.perf_counter() - t0, 3)
+    # Con etiqueta pid: /metrics suma los gauges de todos los workers
+    for etapa, segundos in tiempos_arranque.items():
+        metricas.fijar("buscador_arranque_segundos", segundos, etapa=etapa, pid=str(os.getpid()))
+    app.logger.info("Worker %d listo: %s", os.getpid(),
+                    ", ".join(f"{etapa} {seg:.3f} s" for etapa, seg in tiempos_arranque.items()))
+    return tiempos_arranque
+
+@app.before_request
+def preparar_si_falta():
+    if _worker_pid != os.getpid():
+        preparar_worker(calentar=False)
+
+def crear_app() -> Flask:
+    """
+    Fábrica para gunicorn (wsgi_app = "app:crear_app()"). Importar el módulo
+    no abre conexiones ni arranca hilos, así que es seguro con preload_app;
+    la preparación de cada worker va en preparar_worker().
+    """
+    return app
+
+tiempos_arranque["importacion"] = round(time.perf_counter() - _T_INICIO, 3)
+
 # ===============================
 # EJECUCIÓN DE LA APLICACIÓN
 # ===============================
 if __name__ == '__main__':
+    preparar_worker()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,15 @@
+"""
+Benchmarks del buscador contra una base MySQL local (no la de producción).
+
+    python -m bench.generar_datos --tamano 100k
+    python -m bench.correr --tamano 100k --guardar-base
+    python -m bench.correr --tamano 100k            # compara con la base guardada
+
+Ambos usan las mismas variables DB_* que la app; apúntelas a un MySQL local
+(por ejemplo `docker run -e MYSQL_ROOT_PASSWORD=bench -p 3306:3306 mysql:8`).
+"""
+
+TAMANOS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+def tabla_para(tamano: str) -> str:
+    return f"biotic_database_{tamano}"
@@ -0,0 +1,193 @@
+"""
+Corre los escenarios del buscador contra una tabla generada con
+bench.generar_datos y reporta latencia y pico de memoria por fase.
+
+    python -m bench.correr --tamano 100k [--repeticiones 5] [--guardar-base]
+
+Las fases salen de la misma instrumentación que alimenta Server-Timing y
+/metrics. La latencia se mide sin tracemalloc (mediana de las repeticiones)
+y la memoria en una pasada aparte con tracemalloc activo. Sin --guardar-base
+se compara con bench/bases/<tamano>.json y se sale con código 1 si algún
+escenario empeora más que --tolerancia.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from . import TAMANOS, tabla_para
+
+DIR_BASES = os.path.join(os.path.dirname(__file__), "bases")
+
+def configurar_entorno(tamano: str, con_cache: bool, con_indice: bool) -> str:
+    """Variables para importar la app aislada: tabla de benchmark y cachés en un temporal."""
+    temporal = tempfile.mkdtemp(prefix="bench-buscador-")
+    os.environ.setdefault("DB_NAME", "bench")
+    os.environ["DB_TABLE"] = tabla_para(tamano)
+    os.environ["ENV"] = "development"
+    os.environ["EXPORT_FOLDER"] = os.path.join(temporal, "exports")
+    os.environ["COORD_CACHE_PATH"] = os.path.join(temporal, "coordenadas.sqlite")
+    os.environ["COORD_SYNC_INTERVALO"] = "0"
+    os.environ["RESULT_CACHE_PATH"] = os.path.join(temporal, "resultados.sqlite") if con_cache else ""
+    os.environ["INDICE_TEXTO_PATH"] = os.path.join(temporal, "indice_texto.sqlite")
+    os.environ["INDICE_INTERVALO"] = "60" if con_indice else "0"
+    os.environ["FACETAS_REVISION"] = "0"
+    # Los escenarios de exportación directa miden la tabla completa (con vista previa responderían 409)
+    os.environ["VISTA_PREVIA_UMBRAL"] = "0"
+    os.environ["METRICAS_DIR"] = os.path.join(temporal, "metricas")
+    return temporal
+
+def escenarios(appmod, client):
+    """nombre → (preparar, ejecutar); ejecutar() devuelve la Medicion del request."""
+    capturadas = []
+
+    class MedicionBench(appmod.Medicion):
+        def cerrar(self):
+            super().cerrar()
+            capturadas.append(self)
+
+    appmod.Medicion = MedicionBench
+
+    def pedir(metodo, url, **kw):
+        def ejecutar():
+            capturadas.clear()
+            r = getattr(client, metodo)(url, **kw)
+            r.get_data()  # consume el streaming
+            r.close()
+            if r.status_code != 200:
+                raise RuntimeError(f"{url} respondió {r.status_code}")
+            return capturadas[-1]
+        return ejecutar
+
+    def facetas():
+        m = MedicionBench(appmod.metricas, "facetas")
+        with m.fase("carga"):
+            appmod.cargar_facetas()
+        m.cerrar()
+        return m
+
+    def sesion_exportacion():
+        client.post("/buscar", data={"filtro_grupo_biologico": "Aves"}).close()
+
+    nada = lambda: None
+    return {
+        "facetas": (nada, facetas),
+        "buscar": (nada, pedir("post", "/buscar", data={"filtro_municipio": "Bogotá"})),
+        "buscar_todas": (nada, pedir("post", "/buscar", data={"palabra": "melancholicus", "columna": "__todas__"})),
+        "api_pagina": (nada, pedir("get", "/api/buscar?filtro_municipio=Bogot%C3%A1&total=1&tamano=100")),
+        "puntos": (nada, pedir("get", "/api/puntos?zoom=6")),
+        "exportar_csv": (sesion_exportacion, pedir("get", "/exportar_csv")),
+        "exportar_excel": (sesion_exportacion, pedir("get", "/exportar_excel")),
+        "exportar_geojson": (sesion_exportacion, pedir("get", "/exportar_geojson")),
+    }
+
+def medir(preparar, ejecutar, repeticiones: int) -> dict:
+    preparar()
+    latencias, fases = [], {}
+    medicion = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        medicion = ejecutar()
+        latencias.append(time.perf_counter() - t0)
+        for nombre, segundos in medicion.fases.items():
+            fases.setdefault(nombre, []).append(segundos)
+
+    # Pasada aparte con tracemalloc (lo vuelve varias veces más lento)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        medicion_memoria = ejecutar()
+        pico = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "latencia_s": statistics.median(latencias),
+        "fases_s": {nombre: statistics.median(v) for nombre, v in fases.items()},
+        "memoria_pico_bytes": pico,
+        "memoria_fases_bytes": medicion_memoria.memoria,
+        "filas": medicion.conteos.get("filas", 0),
+        "bytes": medicion.conteos.get("bytes", 0),
+    }
+
+def imprimir(resultados: dict) -> None:
+    print(f"{'escenario':<16}{'latencia':>11}{'memoria':>11}{'filas':>10}{'bytes':>12}  fases")
+    for nombre, r in resultados.items():
+        fases = ", ".join(
+            f"{f}={s * 1000:.0f}ms/{r['memoria_fases_bytes'].get(f, 0) / 2**20:.1f}MiB"
+            for f, s in r["fases_s"].items()
+        )
+        print(f"{nombre:<16}{r['latencia_s'] * 1000:>9.0f}ms{r['memoria_pico_bytes'] / 2**20:>8.1f}MiB"
+              f"{r['filas']:>10,}{r['bytes']:>12,}  {fases}")
+
+def comparar(resultados: dict, base: dict, tolerancia: float) -> list[str]:
+    regresiones = []
+    for nombre, r in resultados.items():
+        previo = base.get(nombre)
+        if not previo:
+            continue
+        for clave, etiqueta in (("latencia_s", "latencia"), ("memoria_pico_bytes", "memoria")):
+            if previo[clave] > 0 and r[clave] > previo[clave] * (1 + tolerancia):
+                regresiones.append(
+                    f"{nombre}: {etiqueta} {r[clave] / previo[clave]:.2f}x la base ({previo[clave]:.4g} → {r[clave]:.4g})"
+                )
+    return regresiones
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamano", choices=TAMANOS, default="10k")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--escenarios", help="lista separada por comas (por defecto todos)")
+    parser.add_argument("--con-cache", action="store_true", help="usar la caché de resultados (por defecto se mide sin ella)")
+    parser.add_argument("--con-indice", action="store_true", help="construir el índice de texto antes de medir")
+    parser.add_argument("--guardar-base", action="store_true", help="guardar los resultados como nueva base")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="empeoramiento permitido sobre la base (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    configurar_entorno(args.tamano, args.con_cache, args.con_indice)
+    import app as appmod  # después de configurar el entorno
+
+    if args.con_indice and appmod.indice_texto is not None:
+        appmod.indice_texto.refrescar(appmod._lotes_indice, True, time.time())
+    client = appmod.app.test_client()
+    todos = escenarios(appmod, client)
+    elegidos = args.escenarios.split(",") if args.escenarios else list(todos)
+
+    resultados = {}
+    for nombre in elegidos:
+        print(f"… {nombre}", file=sys.stderr)
+        resultados[nombre] = medir(*todos[nombre], args.repeticiones)
+    imprimir(resultados)
+
+    ruta_base = os.path.join(DIR_BASES, f"{args.tamano}.json")
+    if args.guardar_base:
+        os.makedirs(DIR_BASES, exist_ok=True)
+        with open(ruta_base, "w", encoding="utf-8") as f:
+            json.dump({
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "maquina": platform.platform(),
+                "resultados": resultados,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Base guardada en {ruta_base}")
+        return 0
+
+    if not os.path.exists(ruta_base):
+        print(f"Sin base en {ruta_base}; use --guardar-base para crearla")
+        return 0
+    with open(ruta_base, encoding="utf-8") as f:
+        base = json.load(f)["resultados"]
+    regresiones = comparar(resultados, base, args.tolerancia)
+    for linea in regresiones:
+        print("REGRESIÓN", linea)
+    return 1 if regresiones else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
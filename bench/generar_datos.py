@@ -0,0 +1,148 @@
+"""
+Genera una biotic_database sintética con la mezcla que se ve en producción:
+varios EPSG colombianos (y algunos vacíos o inválidos), coordenadas con coma
+o punto decimal y Fecha_de_colecta en formatos mezclados.
+
+    python -m bench.generar_datos --tamano 10k|100k|1m [--semilla 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import mysql.connector
+from dotenv import load_dotenv
+from pyproj import Transformer
+
+from . import TAMANOS, tabla_para
+
+MUNICIPIOS = [
+    ("Bogotá", 4.71, -74.07), ("Medellín", 6.24, -75.58), ("Cali", 3.45, -76.53), ("Barranquilla", 10.96, -74.80),
+    ("Cartagena", 10.39, -75.48), ("Bucaramanga", 7.12, -73.12), ("Pasto", 1.21, -77.28), ("Leticia", -4.21, -69.94),
+    ("Villavicencio", 4.14, -73.63), ("Santa Marta", 11.24, -74.20), ("Neiva", 2.93, -75.28), ("Quibdó", 5.69, -76.66),
+    ("Yopal", 5.34, -72.40), ("Mocoa", 1.15, -76.65), ("Riohacha", 11.54, -72.91), ("Puerto Carreño", 6.19, -67.49),
+    ("Tunja", 5.53, -73.36), ("Popayán", 2.44, -76.61), ("Montería", 8.75, -75.88), ("San Andrés", 12.58, -81.70),
+]
+PROYECTOS = [f"Proyecto {n}" for n in (
+    "Río Magdalena", "Páramo de Sumapaz", "Ciénaga Grande", "Piedemonte Llanero", "Chocó Biogeográfico",
+    "Amazonía Norte", "Sierra Nevada", "Altiplano Cundiboyacense", "Cañón del Chicamocha", "Macizo Colombiano",
+)] + [f"PRY-{i:03d}" for i in range(1, 21)]
+GENEROS = ["Tyrannus", "Zenaida", "Anolis", "Pristimantis", "Astyanax", "Hoplias", "Didelphis", "Carollia",
+           "Passiflora", "Espeletia", "Navicula", "Chironomus", "Daphnia", "Cecropia", "Atelopus", "Bothrops"]
+EPITETOS = ["melancholicus", "auriculata", "sp.", "bogotensis", "fasciatus", "malabaricus", "marsupialis",
+            "perspicillata", "edulis", "grandiflora", "cryptocephala", "plumosus", "pulex", "peltata", "varius", "asper"]
+COMUNES = ["Sirirí", "Torcaza", "Lagartija", "Rana", "Sardina", "Moncholo", "Chucha", "Murciélago", None, None]
+GRUPOS = ["Aves", "Mamíferos", "Herpetos", "Hidrobiológico", "Flora", "Insectos"]
+TIPOS_HIDROBIOTA = ["Perifiton", "Fitoplancton", "Zooplancton", "Bentos", "Macrófitas", "Peces"]
+
+# (EPSG, peso): WGS84, MAGNA-SIRGAS Bogotá/Oeste/Este y Origen Nacional; "" = sin EPSG
+EPSG_PESOS = [("4326", 30), ("3116", 25), ("9377", 25), ("3115", 5), ("3117", 5), ("", 7), ("99999", 3)]
+
+COLUMNAS = [
+    ("Codigo_de_muestra", "VARCHAR(32)"), ("Proyecto", "VARCHAR(120)"), ("Municipio", "VARCHAR(80)"),
+    ("Grupo_Biologico", "VARCHAR(60)"), ("Tipo_Hidrobiota", "VARCHAR(60)"),
+    ("Nombre_cientifico", "VARCHAR(160)"), ("Nombre_comun", "VARCHAR(120)"), ("Fecha_de_colecta", "VARCHAR(32)"),
+    ("Latitud_decimal", "VARCHAR(32)"), ("Longitud_decimal", "VARCHAR(32)"), ("Codigo_EPSG_decimal", "VARCHAR(16)"),
+    ("Colector", "VARCHAR(120)"), ("Observaciones", "TEXT"),
+]
+
+def _fecha(rnd: random.Random) -> str:
+    a, m, d = rnd.randint(1995, 2024), rnd.randint(1, 12), rnd.randint(1, 28)
+    formato = rnd.choices(["iso", "dmy", "ymd", "dmy-", "vacia", "texto"], [50, 25, 8, 7, 7, 3])[0]
+    if formato == "iso":
+        return f"{a:04d}-{m:02d}-{d:02d}"
+    if formato == "dmy":
+        return f"{d:02d}/{m:02d}/{a:04d}"
+    if formato == "ymd":
+        return f"{a:04d}/{m:02d}/{d:02d}"
+    if formato == "dmy-":
+        return f"{d:02d}-{m:02d}-{a:04d}"
+    if formato == "vacia":
+        return ""
+    return "sin fecha"
+
+def _numero(valor: float, decimales: int, rnd: random.Random) -> str:
+    texto = f"{valor:.{decimales}f}"
+    return texto.replace(".", ",") if rnd.random() < 0.5 else texto
+
+def generar_filas(n: int, semilla: int):
+    """Genera tuplas en el orden de COLUMNAS, por lotes con coordenadas ya proyectadas."""
+    rnd = random.Random(semilla)
+    transformadores = {
+        epsg: Transformer.from_crs("EPSG:4326", f"EPSG:{epsg}", always_xy=True)
+        for epsg, _ in EPSG_PESOS if epsg not in ("", "4326", "99999")
+    }
+    codigos, pesos = zip(*EPSG_PESOS)
+    especies = [f"{g} {e}" for g in GENEROS for e in EPITETOS]
+    lote = 10_000
+    for inicio in range(0, n, lote):
+        filas = []
+        for i in range(inicio, min(inicio + lote, n)):
+            municipio, lat0, lon0 = rnd.choice(MUNICIPIOS)
+            lat, lon = lat0 + rnd.gauss(0, 0.3), lon0 + rnd.gauss(0, 0.3)
+            epsg = rnd.choices(codigos, pesos)[0]
+            if epsg == "":
+                lat_txt = lon_txt = ""
+            elif epsg == "99999":
+                lat_txt, lon_txt = _numero(lat, 5, rnd), _numero(lon, 5, rnd)
+            elif epsg == "4326":
+                lat_txt, lon_txt = _numero(lat, 6, rnd), _numero(lon, 6, rnd)
+                if rnd.random() < 0.01:
+                    lat_txt = "N/D"
+            else:
+                x, y = transformadores[epsg].transform(lon, lat)
+                lat_txt, lon_txt = _numero(y, 2, rnd), _numero(x, 2, rnd)
+            grupo = rnd.choice(GRUPOS)
+            filas.append((
+                f"M-{i + 1:07d}", rnd.choice(PROYECTOS), municipio, grupo,
+                rnd.choice(TIPOS_HIDROBIOTA) if grupo == "Hidrobiológico" else None,
+                rnd.choice(especies), rnd.choice(COMUNES), _fecha(rnd),
+                lat_txt, lon_txt, epsg, f"Colector {rnd.randint(1, 300)}",
+                rnd.choice(["", "Registro de campo", "Ejemplar juvenil", "Muestra compuesta en orilla"]),
+            ))
+        yield filas
+
+def main(argv=None) -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamano", choices=TAMANOS, default="10k")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    base = os.getenv("DB_NAME", "bench")
+    tabla = tabla_para(args.tamano)
+    n = TAMANOS[args.tamano]
+    conn = mysql.connector.connect(
+        host=os.getenv("DB_HOST", "127.0.0.1"), port=int(os.getenv("DB_PORT", "3306")),
+        user=os.getenv("DB_USER", "root"), password=os.getenv("DB_PASSWORD", ""),
+        charset="utf8mb4", autocommit=False,
+    )
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{base}` CHARACTER SET utf8mb4")
+    cursor.execute(f"DROP TABLE IF EXISTS `{base}`.`{tabla}`")
+    columnas_sql = ", ".join(f"`{c}` {t}" for c, t in COLUMNAS)
+    cursor.execute(
+        f"CREATE TABLE `{base}`.`{tabla}` (`id` INT AUTO_INCREMENT PRIMARY KEY, {columnas_sql}) "
+        f"CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+    )
+    insertar = (
+        f"INSERT INTO `{base}`.`{tabla}` ({', '.join(f'`{c}`' for c, _ in COLUMNAS)}) "
+        f"VALUES ({', '.join(['%s'] * len(COLUMNAS))})"
+    )
+    t0 = time.perf_counter()
+    hechas = 0
+    for filas in generar_filas(n, args.semilla):
+        cursor.executemany(insertar, filas)
+        conn.commit()
+        hechas += len(filas)
+        print(f"\r{tabla}: {hechas:,}/{n:,} filas", end="", file=sys.stderr)
+    cursor.execute(f"ANALYZE TABLE `{base}`.`{tabla}`")
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+    print(f"\n{tabla}: {n:,} filas en {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""
+Módulos de apoyo del Buscador Biótico.
+
+No dependen de Flask: `app.py` los configura y los usa desde las rutas.
+"""
@@ -0,0 +1,140 @@
+"""
+Archivos de exportación terminados (artefactos) y su limpieza.
+
+Un índice SQLite local, compartido por los workers, lleva cada artefacto
+vivo: id, dueño, formato, archivo, tamaño, creación y último acceso. Las
+descargas buscan la ruta en el índice (nunca en la sesión) y actualizan el
+último acceso.
+
+La limpieza corre en un hilo aparte (un worker a la vez), no en los requests.
+Se borran:
+- los artefactos sin acceso por más de `ttl` segundos;
+- los más antiguos por último acceso (LRU) mientras el total supere la cuota;
+- los archivos sueltos de la carpeta que no están en el índice (temporales
+  de una exportación directa o parciales de un worker caído) sin tocar por
+  más de `gracia` segundos.
+"""
+import os
+import sqlite3
+import time
+
+from .sqlite_local import ConexionesSQLite, bloqueo_exclusivo
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS artefactos (
+    id       TEXT PRIMARY KEY,
+    dueno    TEXT NOT NULL,
+    formato  TEXT NOT NULL,
+    archivo  TEXT NOT NULL,
+    bytes    INTEGER NOT NULL,
+    creado   REAL NOT NULL,
+    accedido REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS artefactos_accedido ON artefactos (accedido);
+"""
+
+_COLUMNAS = ("id", "dueno", "formato", "archivo", "bytes", "creado", "accedido")
+
+class AlmacenArtefactos:
+    def __init__(self, directorio: str, ruta_indice: str, cuota_bytes: int, ttl: float, gracia: float = 3600.0):
+        self.directorio = directorio
+        self.ruta_indice = ruta_indice
+        self.cuota_bytes = cuota_bytes
+        self.ttl = ttl
+        self.gracia = gracia
+        os.makedirs(directorio, exist_ok=True)
+        self._conexiones = ConexionesSQLite(ruta_indice, _ESQUEMA)
+        self._al_borrar = []
+
+    def _conexion(self) -> sqlite3.Connection:
+        return self._conexiones.conexion()
+
+    def al_borrar(self, funcion) -> None:
+        """funcion(id) se llama por cada artefacto que la limpieza borra."""
+        self._al_borrar.append(funcion)
+
+    # ---------- Índice ----------
+    def registrar(self, id_artefacto: str, dueno: str, formato: str, ruta: str) -> dict:
+        """Agrega al índice un archivo ya escrito dentro de la carpeta."""
+        ahora = time.time()
+        fila = (id_artefacto, dueno, formato, os.path.basename(ruta), os.path.getsize(ruta), ahora, ahora)
+        with self._conexion() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO artefactos ({', '.join(_COLUMNAS)}) VALUES (?, ?, ?, ?, ?, ?, ?)", fila
+            )
+        return dict(zip(_COLUMNAS, fila))
+
+    def obtener(self, id_artefacto: str, tocar: bool = True) -> dict | None:
+        """Artefacto con su ruta absoluta, o None si no está (o su archivo desapareció)."""
+        conn = self._conexion()
+        fila = conn.execute(
+            f"SELECT {', '.join(_COLUMNAS)} FROM artefactos WHERE id = ?", (id_artefacto,)
+        ).fetchone()
+        if fila is None:
+            return None
+        artefacto = dict(zip(_COLUMNAS, fila))
+        artefacto["ruta"] = os.path.abspath(os.path.join(self.directorio, artefacto["archivo"]))
+        if not os.path.exists(artefacto["ruta"]):
+            with conn:
+                conn.execute("DELETE FROM artefactos WHERE id = ?", (id_artefacto,))
+            return None
+        if tocar:
+            try:
+                with conn:
+                    conn.execute("UPDATE artefactos SET accedido = ? WHERE id = ?", (time.time(), id_artefacto))
+            except sqlite3.OperationalError:
+                pass  # índice ocupado por la limpieza: no impide la descarga
+        return artefacto
+
+    def estadisticas(self) -> dict:
+        cantidad, total = self._conexion().execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM artefactos"
+        ).fetchone()
+        return {"artefactos": cantidad, "bytes": total, "cuota_bytes": self.cuota_bytes}
+
+    # ---------- Limpieza ----------
+    def limpiar(self, ahora: float | None = None) -> list[str]:
+        """Una pasada de limpieza; devuelve los ids borrados del índice."""
+        ahora = time.time() if ahora is None else ahora
+        conn = self._conexion()
+        filas = conn.execute("SELECT id, archivo, bytes, accedido FROM artefactos ORDER BY accedido").fetchall()
+        total = sum(f[2] for f in filas)
+        borrar = []
+        for id_artefacto, archivo, n, accedido in filas:
+            ruta = os.path.join(self.directorio, archivo)
+            if ahora - accedido > self.ttl or total > self.cuota_bytes or not os.path.exists(ruta):
+                borrar.append((id_artefacto, ruta))
+                total -= n
+
+        for id_artefacto, ruta in borrar:
+            # Primero el índice: ninguna descarga nueva encuentra el archivo.
+            # Una descarga en curso sigue leyendo (el archivo abierto no se pierde).
+            with conn:
+                conn.execute("DELETE FROM artefactos WHERE id = ?", (id_artefacto,))
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            for funcion in self._al_borrar:
+                funcion(id_artefacto)
+
+        self._barrer_sueltos(conn, ahora)
+        return [id_artefacto for id_artefacto, _ in borrar]
+
+    def _barrer_sueltos(self, conn: sqlite3.Connection, ahora: float) -> None:
+        indexados = {f[0] for f in conn.execute("SELECT archivo FROM artefactos")}
+        propios = os.path.basename(self.ruta_indice)
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or entrada.name in indexados or entrada.name.startswith(propios):
+                    continue
+                try:
+                    if ahora - entrada.stat().st_mtime > self.gracia:
+                        os.remove(entrada.path)
+                except OSError:
+                    pass
+
+    def limpiar_exclusivo(self) -> list[str] | None:
+        """limpiar() si ningún otro worker la está haciendo (si no, None)."""
+        with bloqueo_exclusivo(self.ruta_indice) as obtenido:
+            return self.limpiar() if obtenido else None
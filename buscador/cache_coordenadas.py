@@ -0,0 +1,129 @@
+"""
+Caché persistente de coordenadas WGS84 (Latitud_mapa / Longitud_mapa).
+
+Es un archivo SQLite local compartido por todos los workers. La clave es la
+PK de la fila más un hash de los valores originales (latitud, longitud,
+EPSG): si la fila cambia en MySQL el hash deja de coincidir y solo esa fila
+se vuelve a reproyectar. También se guardan las filas que fallan (con su
+motivo) para no reintentarlas en cada búsqueda.
+"""
+import hashlib
+import sqlite3
+
+from . import reproyeccion
+from .sqlite_local import ConexionesSQLite, bloqueo_exclusivo
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS coordenadas (
+    pk     TEXT PRIMARY KEY,
+    hash   TEXT NOT NULL,
+    lat    REAL,
+    lon    REAL,
+    motivo INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+def hash_fuente(lat, lon, epsg) -> str:
+    """Huella de los valores originales de coordenadas de una fila."""
+    return hashlib.blake2b(f"{lat}\x1f{lon}\x1f{epsg}".encode("utf-8"), digest_size=8).hexdigest()
+
+class CacheCoordenadas:
+    LOTE_SQL = 500  # variables por consulta IN (...)
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._conexiones = ConexionesSQLite(ruta, _ESQUEMA)
+        self.aciertos = 0
+        self.calculadas = 0
+
+    def _conexion(self) -> sqlite3.Connection:
+        return self._conexiones.conexion()
+
+    def resolver(self, pks, lats, lons, epsgs):
+        """
+        Igual que reproyeccion.reproyectar_lote pero usando la caché:
+        devuelve (lat_wgs84, lon_wgs84, motivos) y solo reproyecta las filas
+        nuevas o modificadas.
+        """
+        n = len(pks)
+        claves = [str(pk) for pk in pks]
+        hashes = [hash_fuente(lats[i], lons[i], epsgs[i]) for i in range(n)]
+        conn = self._conexion()
+
+        guardadas = {}
+        for ini in range(0, n, self.LOTE_SQL):
+            parte = claves[ini:ini + self.LOTE_SQL]
+            marcas = ",".join("?" * len(parte))
+            for pk, h, la, lo, m in conn.execute(
+                f"SELECT pk, hash, lat, lon, motivo FROM coordenadas WHERE pk IN ({marcas})", parte
+            ):
+                guardadas[pk] = (h, la, lo, m)
+
+        lat_out: list[float | None] = [None] * n
+        lon_out: list[float | None] = [None] * n
+        motivos = bytearray(n)
+        faltan = []
+        for i in range(n):
+            g = guardadas.get(claves[i])
+            if g is not None and g[0] == hashes[i]:
+                lat_out[i], lon_out[i], motivos[i] = g[1], g[2], g[3]
+            else:
+                faltan.append(i)
+
+        if faltan:
+            la, lo, mo = reproyeccion.reproyectar_lote(
+                [lats[i] for i in faltan], [lons[i] for i in faltan], [epsgs[i] for i in faltan]
+            )
+            for j, i in enumerate(faltan):
+                lat_out[i], lon_out[i], motivos[i] = la[j], lo[j], mo[j]
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO coordenadas (pk, hash, lat, lon, motivo) VALUES (?, ?, ?, ?, ?)",
+                        [(claves[i], hashes[i], lat_out[i], lon_out[i], motivos[i]) for i in faltan]
+                    )
+            except sqlite3.OperationalError:
+                # Base ocupada por otro worker: el resultado sigue siendo válido, solo no se guarda
+                pass
+
+        self.aciertos += n - len(faltan)
+        self.calculadas += len(faltan)
+        return lat_out, lon_out, motivos
+
+    # ---------- Sincronización incremental ----------
+    def ultima_pk(self):
+        fila = self._conexion().execute("SELECT valor FROM meta WHERE clave = 'ultima_pk'").fetchone()
+        return fila[0] if fila else None
+
+    def sincronizar(self, lotes) -> int:
+        """
+        Precalcula coordenadas desde un iterable de lotes (pks, lats, lons, epsgs)
+        ordenados por PK; guarda la última PK vista para continuar desde ahí.
+        Devuelve cuántas filas se procesaron.
+        """
+        procesadas = 0
+        conn = self._conexion()
+        for pks, lats, lons, epsgs in lotes:
+            if not pks:
+                continue
+            self.resolver(pks, lats, lons, epsgs)
+            procesadas += len(pks)
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (clave, valor) VALUES ('ultima_pk', ?)", (str(pks[-1]),)
+                )
+        return procesadas
+
+    def sincronizar_exclusivo(self, crear_lotes) -> int | None:
+        """
+        Ejecuta sincronizar(crear_lotes(ultima_pk)) solo si ningún otro worker
+        lo está haciendo (flock sobre <ruta>.lock). Devuelve None si otro lo tiene.
+        """
+        with bloqueo_exclusivo(self.ruta) as obtenido:
+            if not obtenido:
+                return None
+            return self.sincronizar(crear_lotes(self.ultima_pk()))
@@ -0,0 +1,101 @@
+"""
+Caché de resultados compartida por todos los workers (archivo SQLite local).
+
+Cada entrada guarda la versión de los datos con la que se calculó; una
+lectura con otra versión es un fallo. Se expulsa por TTL y, cuando el total
+supera el presupuesto de bytes, por LRU (columna `usado`).
+
+Los valores se guardan con pickle + zlib: el archivo es local y solo lo
+escribe esta aplicación.
+"""
+import pickle
+import sqlite3
+import time
+import zlib
+
+from .sqlite_local import ConexionesSQLite
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    clave   TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    valor   BLOB NOT NULL,
+    bytes   INTEGER NOT NULL,
+    creado  REAL NOT NULL,
+    usado   REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS resultados_usado ON resultados (usado);
+"""
+
+class CacheResultados:
+    def __init__(self, ruta: str, max_bytes: int, ttl: float):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._conexiones = ConexionesSQLite(ruta, _ESQUEMA)
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _conexion(self) -> sqlite3.Connection:
+        return self._conexiones.conexion()
+
+    def obtener(self, clave: str, version: str):
+        """Valor guardado o None (ausente, vencido o de otra versión de los datos)."""
+        conn = self._conexion()
+        try:
+            fila = conn.execute(
+                "SELECT valor, creado FROM resultados WHERE clave = ? AND version = ?", (clave, version)
+            ).fetchone()
+            ahora = time.time()
+            if fila is None or ahora - fila[1] > self.ttl:
+                self.fallos += 1
+                return None
+            with conn:
+                conn.execute("UPDATE resultados SET usado = ? WHERE clave = ?", (ahora, clave))
+        except sqlite3.OperationalError:
+            # Base ocupada por otro worker: se trata como fallo
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        return pickle.loads(zlib.decompress(fila[0]))
+
+    def guardar(self, clave: str, version: str, valor) -> bool:
+        datos = zlib.compress(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        if len(datos) > self.max_bytes // 4:
+            return False  # una sola entrada no puede desplazar media caché
+        ahora = time.time()
+        conn = self._conexion()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO resultados (clave, version, valor, bytes, creado, usado) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (clave, version, datos, len(datos), ahora, ahora)
+                )
+                self._recortar(conn, ahora)
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def _recortar(self, conn: sqlite3.Connection, ahora: float) -> None:
+        conn.execute("DELETE FROM resultados WHERE creado < ?", (ahora - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM resultados").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        sobrante = total - self.max_bytes
+        expulsar = []
+        for clave, nbytes in conn.execute("SELECT clave, bytes FROM resultados ORDER BY usado"):
+            expulsar.append((clave,))
+            sobrante -= nbytes
+            if sobrante <= 0:
+                break
+        conn.executemany("DELETE FROM resultados WHERE clave = ?", expulsar)
+
+    def invalidar(self, version_vigente: str) -> None:
+        """Borra las entradas calculadas con otra versión de los datos."""
+        conn = self._conexion()
+        try:
+            with conn:
+                conn.execute("DELETE FROM resultados WHERE version != ?", (version_vigente,))
+        except sqlite3.OperationalError:
+            pass
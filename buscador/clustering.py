@@ -0,0 +1,122 @@
+"""
+Clustering de puntos del lado del servidor, por nivel de zoom.
+
+Los puntos de un ConjuntoPuntos se proyectan una vez a Web Mercator
+normalizado (0..1). Para cada zoom se agrupan en celdas de RADIO_PX
+píxeles (como el radio de Leaflet.markercluster) y se guarda por celda el
+conteo, el centroide y la caja de sus puntos. Cada nivel se calcula la
+primera vez que se pide y queda guardado en el conjunto, así el mapa solo
+recibe agregados de la vista actual, nunca todos los puntos.
+"""
+import math
+import threading
+from array import array
+
+TAMANO_TESELA = 256
+
+def _mercator(lat: float, lon: float) -> tuple[float, float]:
+    """lat/lon → (x, y) en [0, 1] (origen arriba a la izquierda, como las teselas)."""
+    x = (lon + 180.0) / 360.0
+    s = math.sin(math.radians(max(min(lat, 85.05112878), -85.05112878)))
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return x, y
+
+class Nivel:
+    """Agregados de un zoom: celda → [n, suma_lat, suma_lon, primer_indice, oeste, sur, este, norte]."""
+
+    def __init__(self, zoom: int, radio_px: int):
+        self.zoom = zoom
+        self.escala = TAMANO_TESELA * (2 ** zoom) / radio_px  # celdas por unidad Mercator
+        self.celdas: dict[tuple[int, int], list] = {}
+
+class Clusterizador:
+    def __init__(self, conjunto, radio_px: int = 60, zoom_max: int = 16):
+        self.conjunto = conjunto
+        self.radio_px = radio_px
+        self.zoom_max = zoom_max
+        self._x = array('d')
+        self._y = array('d')
+        for la, lo in zip(conjunto.lat, conjunto.lon):
+            x, y = _mercator(la, lo)
+            self._x.append(x)
+            self._y.append(y)
+        self._niveles: dict[int, Nivel] = {}
+        self._lock = threading.Lock()
+
+    def nivel(self, zoom: int) -> Nivel:
+        zoom = max(0, min(int(zoom), self.zoom_max))
+        nivel = self._niveles.get(zoom)
+        if nivel is not None:
+            return nivel
+        with self._lock:
+            nivel = self._niveles.get(zoom)
+            if nivel is None:
+                nivel = self._construir(zoom)
+                self._niveles[zoom] = nivel
+        return nivel
+
+    def _construir(self, zoom: int) -> Nivel:
+        nivel = Nivel(zoom, self.radio_px)
+        escala = nivel.escala
+        celdas = nivel.celdas
+        lat, lon = self.conjunto.lat, self.conjunto.lon
+        for i in range(len(lat)):
+            clave = (int(self._x[i] * escala), int(self._y[i] * escala))
+            c = celdas.get(clave)
+            la, lo = lat[i], lon[i]
+            if c is None:
+                celdas[clave] = [1, la, lo, i, lo, la, lo, la]
+            else:
+                c[0] += 1
+                c[1] += la
+                c[2] += lo
+                if lo < c[4]: c[4] = lo
+                if la < c[5]: c[5] = la
+                if lo > c[6]: c[6] = lo
+                if la > c[7]: c[7] = la
+        return nivel
+
+    def consultar(self, zoom: int, bbox=None) -> tuple[list[dict], list[int]]:
+        """
+        Devuelve (clusters, indices_sueltos) de la vista: los clusters traen
+        lat/lon del centroide, `n` y la caja de sus puntos; las celdas con un
+        solo punto salen como puntos sueltos. Desde zoom_max todo va suelto.
+        """
+        if zoom >= self.zoom_max:
+            if bbox is None:
+                return [], list(range(len(self.conjunto)))
+            return [], self.conjunto.en_bbox(*bbox)
+
+        nivel = self.nivel(zoom)
+        if bbox is None:
+            seleccion = nivel.celdas.values()
+        else:
+            oeste, sur, este, norte = bbox
+            x0, y0 = _mercator(norte, oeste)
+            x1, y1 = _mercator(sur, este)
+            escala = nivel.escala
+            cx0, cy0 = int(x0 * escala), int(y0 * escala)
+            cx1, cy1 = int(x1 * escala), int(y1 * escala)
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(nivel.celdas):
+                seleccion = [c for (cx, cy), c in nivel.celdas.items()
+                             if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+            else:
+                seleccion = []
+                for cx in range(cx0, cx1 + 1):
+                    for cy in range(cy0, cy1 + 1):
+                        c = nivel.celdas.get((cx, cy))
+                        if c is not None:
+                            seleccion.append(c)
+
+        clusters, sueltos = [], []
+        for c in seleccion:
+            if c[0] == 1:
+                sueltos.append(c[3])
+            else:
+                clusters.append({
+                    "lat": c[1] / c[0],
+                    "lon": c[2] / c[0],
+                    "n": c[0],
+                    "bbox": [c[4], c[5], c[6], c[7]],
+                })
+        return clusters, sueltos
@@ -0,0 +1,122 @@
+"""
+Compresión de respuestas según Accept-Encoding: brotli si el paquete
+`brotli` está instalado, si no gzip.
+
+Las respuestas en memoria se comprimen de una vez (si superan un mínimo);
+las de streaming (exportaciones) bloque por bloque, con un flush por bloque
+para que el cliente siga recibiendo datos mientras se genera el archivo.
+Los estáticos se comprimen una sola vez al arrancar, al nivel máximo, y se
+sirven desde memoria.
+"""
+import mimetypes
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se ofrece gzip
+    brotli = None
+
+CODIFICACIONES = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+TIPOS_COMPRIMIBLES = (
+    'text/', 'application/json', 'application/geo+json', 'application/x-ndjson',
+    'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+def es_comprimible(mimetype: str | None) -> bool:
+    return bool(mimetype) and mimetype.startswith(TIPOS_COMPRIMIBLES)
+
+def elegir_codificacion(aceptadas) -> str | None:
+    """La codificación disponible con mayor calidad en Accept-Encoding (werkzeug Accept); br gana empates."""
+    mejor, calidad = None, 0
+    for codificacion in CODIFICACIONES:
+        q = aceptadas[codificacion]
+        if q > calidad:
+            mejor, calidad = codificacion, q
+    return mejor
+
+class _Compresor:
+    def __init__(self, codificacion: str, nivel: int):
+        self._br = codificacion == 'br'
+        # wbits 31 = deflate con encabezado gzip
+        self._c = brotli.Compressor(quality=nivel) if self._br else zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._c.process(datos) if self._br else self._c.compress(datos)
+
+    def vaciar(self) -> bytes:
+        """Lo comprimido hasta ahora, sin cerrar el flujo (para enviar el bloque ya)."""
+        return self._c.flush() if self._br else self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminar(self) -> bytes:
+        return self._c.finish() if self._br else self._c.flush()
+
+def comprimir(datos: bytes, codificacion: str, nivel: int) -> bytes:
+    c = _Compresor(codificacion, nivel)
+    return c.comprimir(datos) + c.terminar()
+
+def comprimir_por_bloques(bloques, codificacion: str, nivel: int, vaciar: bool = True):
+    """
+    Comprime un iterable de bytes sin juntarlo; cierra el iterable de origen
+    al terminar. vaciar=True envía cada bloque apenas llega (generadores
+    lentos); con False el compresor decide (archivos ya escritos, mejor tasa).
+    """
+    c = _Compresor(codificacion, nivel)
+    try:
+        for bloque in bloques:
+            if not bloque:
+                continue
+            datos = c.comprimir(bloque) + (c.vaciar() if vaciar else b"")
+            if datos:
+                yield datos
+        yield c.terminar()
+    finally:
+        cerrar = getattr(bloques, "close", None)
+        if cerrar:
+            cerrar()
+
+class EstaticosComprimidos:
+    """Versiones comprimidas de los archivos estáticos, calculadas una vez por archivo (y mtime)."""
+
+    NIVEL_MAXIMO = {'br': 11, 'gzip': 9}
+
+    def __init__(self, carpeta: str, min_bytes: int = 1024):
+        self.carpeta = carpeta
+        self.min_bytes = min_bytes
+        self._archivos: dict[str, tuple[float, dict[str, bytes]]] = {}  # nombre → (mtime, {codificación: bytes})
+
+    def precomprimir(self) -> int:
+        """Comprime todos los estáticos comprimibles; devuelve cuántos archivos quedaron listos."""
+        if not os.path.isdir(self.carpeta):
+            return 0
+        for raiz, _, archivos in os.walk(self.carpeta):
+            for archivo in archivos:
+                nombre = os.path.relpath(os.path.join(raiz, archivo), self.carpeta).replace(os.sep, "/")
+                self._cargar(nombre)
+        return len(self._archivos)
+
+    def _cargar(self, nombre: str):
+        ruta = os.path.join(self.carpeta, nombre)
+        try:
+            mtime, tamano = os.path.getmtime(ruta), os.path.getsize(ruta)
+        except OSError:
+            return None
+        if tamano < self.min_bytes or not es_comprimible(mimetypes.guess_type(nombre)[0]):
+            return None
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        variantes = {cod: comprimir(datos, cod, self.NIVEL_MAXIMO[cod]) for cod in CODIFICACIONES}
+        self._archivos[nombre] = (mtime, variantes)
+        return self._archivos[nombre]
+
+    def obtener(self, nombre: str, codificacion: str) -> bytes | None:
+        """Bytes comprimidos de `nombre`; si el archivo cambió en disco se vuelve a comprimir."""
+        entrada = self._archivos.get(nombre)
+        try:
+            vigente = entrada is not None and os.path.getmtime(os.path.join(self.carpeta, nombre)) == entrada[0]
+        except OSError:
+            return None
+        if not vigente:
+            entrada = self._cargar(nombre)
+        return entrada[1].get(codificacion) if entrada else None
@@ -0,0 +1,215 @@
+"""
+Sumideros de exportación para buscador.flujo: CSV en bloques, Excel
+write-only y GeoJSON / NDJSON en streaming. Reciben lotes (buscador.filas.Lote) ya reproyectados y con
+fechas normalizadas (date), así que no vuelven a transformar nada: solo
+recorren las tuplas de las columnas exportadas.
+"""
+import csv
+import io
+import json
+import math
+from datetime import date
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+class SumideroCSV:
+    """escribir(lote) → bytes UTF-8 del lote (el primero lleva BOM, metadatos y encabezado)."""
+    fase = "escritura"
+
+    def __init__(self, columnas, delimitador: str = ",", bom: bool = True, metadatos: str = ""):
+        self.columnas = list(columnas)
+        self.bytes = 0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, delimiter=delimitador, quoting=csv.QUOTE_MINIMAL)
+        if bom:
+            self._buffer.write('\ufeff')
+        if metadatos:
+            self._buffer.write(metadatos)
+        self._writer.writerow(self.columnas)
+
+    def _volcar(self) -> bytes:
+        datos = self._buffer.getvalue().encode('utf-8')
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        self.bytes += len(datos)
+        return datos
+
+    def escribir(self, lote) -> bytes:
+        # Las fechas ya vienen como date: str() da AAAA-MM-DD
+        self._writer.writerows(lote.tuplas(self.columnas))
+        return self._volcar()
+
+    def cerrar(self) -> bytes | None:
+        return self._volcar() if self._buffer.tell() else None
+
+class SumideroExcel:
+    """
+    Libro .xlsx en modo write-only: cada fila va al disco al hacer append.
+    Los anchos de columna se calculan sobre las primeras `muestra_ancho`
+    filas (hay que fijarlos antes de la primera fila), que se retienen
+    hasta completar la muestra. Al cerrar agrega la hoja "Resumen" y guarda.
+    """
+    fase = "escritura"
+    fase_cierre = "guardado"
+
+    def __init__(self, destino: str, columnas, resumen=(), muestra_ancho: int = 1000, ancho_max: int = 60,
+                 color_relleno: str = "18263f", color_fuente: str = "e6ebff"):
+        self.destino = destino
+        self.columnas = list(columnas)
+        self.resumen = list(resumen)   # filas (campo, valor) después de total_registros
+        self.muestra_ancho = muestra_ancho
+        self.ancho_max = ancho_max
+        self.color_relleno = color_relleno
+        self.color_fuente = color_fuente
+        self.total = 0
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(title="Datos")
+        self._muestra: list[tuple] | None = []   # None una vez escrito el encabezado
+
+    def _celda(self, val):
+        if isinstance(val, date):
+            c = WriteOnlyCell(self._ws, value=val)
+            c.number_format = 'YYYY-MM-DD'
+            return c
+        return val
+
+    def _iniciar_hoja(self) -> None:
+        ws = self._ws
+        for idx, col in enumerate(self.columnas):
+            max_len = len(str(col))
+            for valores in self._muestra:
+                val = valores[idx]
+                if val is None:
+                    length = 0
+                elif isinstance(val, date):
+                    length = 10  # AAAA-MM-DD
+                else:
+                    length = len(str(val))
+                if length > max_len:
+                    max_len = length
+            ws.column_dimensions[get_column_letter(idx + 1)].width = min(max_len + 2, self.ancho_max)
+        ws.freeze_panes = "A2"
+
+        header = []
+        for col in self.columnas:
+            c = WriteOnlyCell(ws, value=col)
+            c.font = Font(bold=True, color=self.color_fuente)
+            c.fill = PatternFill(start_color=self.color_relleno, end_color=self.color_relleno, fill_type="solid")
+            header.append(c)
+        ws.append(header)
+        for valores in self._muestra:
+            ws.append([self._celda(v) for v in valores])
+        self._muestra = None
+
+    def escribir(self, lote) -> None:
+        self.total += len(lote)
+        if self._muestra is not None:
+            self._muestra.extend(lote.tuplas(self.columnas))
+            if len(self._muestra) >= self.muestra_ancho:
+                self._iniciar_hoja()
+            return
+        append, celda = self._ws.append, self._celda
+        for valores in lote.tuplas(self.columnas):
+            append([celda(v) for v in valores])
+
+    def cerrar(self) -> None:
+        if self._muestra is not None:
+            self._iniciar_hoja()
+        self._ws.auto_filter.ref = f"A1:{get_column_letter(len(self.columnas))}{self.total + 1}"
+
+        resumen = self._wb.create_sheet(title="Resumen")
+        encabezado_resumen = []
+        for texto in ("Campo", "Valor"):
+            c = WriteOnlyCell(resumen, value=texto)
+            c.font = Font(bold=True)
+            encabezado_resumen.append(c)
+        resumen.append(encabezado_resumen)
+        resumen.append(["total_registros", self.total])
+        for fila in self.resumen:
+            resumen.append(list(fila))
+        self._wb.save(self.destino)
+
+class _SumideroGeo:
+    """
+    Base de GeoJSON y NDJSON: un Feature por fila con geometría Point en
+    WGS84 (Latitud_mapa/Longitud_mapa ya reproyectadas) y las columnas
+    exportadas como propiedades. Las filas sin coordenadas válidas se
+    omiten y se cuentan (con sus ids, hasta `max_ids`) para el resumen
+    final; con incluir_sin_coordenadas=True salen con "geometry": null.
+    """
+    fase = "escritura"
+    COLUMNAS_MAPA = ('Latitud_mapa', 'Longitud_mapa')
+
+    def __init__(self, columnas, columna_id: str | None = None, incluir_sin_coordenadas: bool = False,
+                 max_ids: int = 1000):
+        self.propiedades = [c for c in columnas if c not in self.COLUMNAS_MAPA]
+        self.columna_id = columna_id
+        self.incluir_sin_coordenadas = incluir_sin_coordenadas
+        self.max_ids = max_ids
+        self.escritas = 0
+        self.omitidas = 0
+        self.ids_omitidos: list = []
+        self.bytes = 0
+        self._filas_vistas = 0
+        self._json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str).encode
+
+    def _features(self, lote):
+        """Texto JSON de cada Feature del lote (sin separadores)."""
+        ids = lote.columna(self.columna_id) if self.columna_id and self.columna_id in lote else None
+        lats, lons = lote.arreglo('Latitud_mapa'), lote.arreglo('Longitud_mapa')
+        codificar, nombres = self._json, self.propiedades
+        for i, (la, lo, valores) in enumerate(zip(lats, lons, lote.tuplas(nombres, None))):
+            if math.isnan(la):
+                if not self.incluir_sin_coordenadas:
+                    self.omitidas += 1
+                    if len(self.ids_omitidos) < self.max_ids:
+                        self.ids_omitidos.append(ids[i] if ids is not None else self._filas_vistas + i + 1)
+                    continue
+                geometria = 'null'
+            else:
+                geometria = f'{{"type":"Point","coordinates":[{round(lo, 7)!r},{round(la, 7)!r}]}}'
+            self.escritas += 1
+            yield f'{{"type":"Feature","geometry":{geometria},"properties":{codificar(dict(zip(nombres, valores)))}}}'
+        self._filas_vistas += len(lote)
+
+    def resumen(self) -> dict:
+        return {
+            "escritas": self.escritas,
+            "omitidas": self.omitidas,
+            "ids_omitidos": self.ids_omitidos,
+            "ids_truncados": self.omitidas > len(self.ids_omitidos),
+        }
+
+    def _bytes(self, texto: str) -> bytes:
+        datos = texto.encode('utf-8')
+        self.bytes += len(datos)
+        return datos
+
+class SumideroGeoJSON(_SumideroGeo):
+    """FeatureCollection; el resumen de filas omitidas va al final como miembro "omitidas"."""
+
+    APERTURA = '{"type":"FeatureCollection","features":['
+
+    def escribir(self, lote) -> bytes:
+        separador = "," if self.escritas else ""
+        texto = ",".join(self._features(lote))
+        if not self.bytes:
+            return self._bytes(self.APERTURA + texto)
+        return self._bytes(separador + texto) if texto else None
+
+    def cerrar(self) -> bytes:
+        apertura = "" if self.bytes else self.APERTURA
+        return self._bytes(f'{apertura}],"omitidas":{self._json(self.resumen())}}}\n')
+
+class SumideroNDJSON(_SumideroGeo):
+    """Un Feature por línea; la última línea es {"omitidas": {...}} con el resumen."""
+
+    def escribir(self, lote) -> bytes | None:
+        texto = "".join(f"{feature}\n" for feature in self._features(lote))
+        return self._bytes(texto) if texto else None
+
+    def cerrar(self) -> bytes:
+        return self._bytes(f'{self._json({"omitidas": self.resumen()})}\n')
@@ -0,0 +1,77 @@
+"""
+Listas de valores (facetas) del formulario principal, con conteo por valor.
+
+Se cargan con un GROUP BY por faceta, los cinco a la vez (el `cargar` de
+app.py los corre por el pool async de buscador.metadatos), y quedan en
+memoria del worker. Un hilo en segundo plano las recarga cuando vence el
+TTL o cambia la versión de los datos, así el request de "/" nunca espera el
+recorrido de la tabla (salvo el primero, si el precalentado todavía no
+terminó). Sin ese hilo, obtener() las recarga en el request cuando están
+vencidas.
+"""
+import threading
+import time
+
+class ServicioFacetas:
+    def __init__(self, cargar, version, ttl: float = 600.0, revision: float = 30.0):
+        """
+        cargar() → {faceta: [(valor, conteo), ...]}; version() → token de
+        los datos (o None si no se pudo sondear).
+        """
+        self._cargar = cargar
+        self._version = version
+        self.ttl = ttl
+        self.revision = revision
+        self._datos: dict | None = None
+        self._version_datos = None
+        self._cargado_en = 0.0
+        self._al_recargar = []
+        self._hilo_activo = False
+        self._lock = threading.Lock()  # una sola carga a la vez por worker
+
+    def al_recargar(self, funcion) -> None:
+        """funcion(datos) se llama tras cada carga (p. ej. para reconstruir índices derivados)."""
+        self._al_recargar.append(funcion)
+
+    def recargar(self) -> dict:
+        with self._lock:
+            version = self._version()
+            datos = self._cargar()
+            for funcion in self._al_recargar:
+                funcion(datos)
+            self._datos, self._version_datos, self._cargado_en = datos, version, time.monotonic()
+            return datos
+
+    def version_cargada(self):
+        """Versión de los datos con la que se cargaron las facetas en memoria (None si aún no hay)."""
+        return self._version_datos
+
+    def vigentes(self) -> bool:
+        if self._datos is None or time.monotonic() - self._cargado_en > self.ttl:
+            return False
+        version = self._version()
+        return version is None or version == self._version_datos
+
+    def obtener(self) -> dict:
+        datos = self._datos
+        if datos is not None and (self._hilo_activo or self.vigentes()):
+            return datos
+        # Arranque en frío (o vencidas sin hilo): un solo request carga, los demás esperan el lock
+        with self._lock:
+            if self.vigentes():
+                return self._datos
+        return self.recargar()
+
+    def _hilo(self, registrar_error) -> None:
+        while True:
+            try:
+                if not self.vigentes():
+                    self.recargar()
+            except Exception as e:
+                registrar_error(e)
+            time.sleep(self.revision)
+
+    def iniciar(self, registrar_error=lambda e: None) -> None:
+        """Precalienta y mantiene las facetas al día desde un hilo daemon."""
+        self._hilo_activo = True
+        threading.Thread(target=self._hilo, args=(registrar_error,), name="facetas", daemon=True).start()
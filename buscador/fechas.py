@@ -0,0 +1,91 @@
+"""
+Normalización de las columnas de fecha para las exportaciones.
+
+Las fechas llegan como texto en varios formatos (2021-03-05, 05/03/2021,
+2021/03/05, 05-03-2021). En vez de probar strptime con cada formato en cada
+celda, se infiere de una muestra el formato dominante de cada columna, se
+parsea con expresiones regulares (probando ese formato primero) y se
+memoriza cada texto ya visto: las fechas de colecta se repiten mucho.
+
+El resultado es un `date` por celda (o el texto original si no es una
+fecha), igual para CSV, Excel y cualquier otro exportador.
+"""
+import re
+from datetime import date
+
+# (formato strptime equivalente, patrón, posición de año, mes y día en los grupos)
+_FORMATOS = (
+    ("%Y-%m-%d", re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})", re.ASCII), (0, 1, 2)),
+    ("%d/%m/%Y", re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})", re.ASCII), (2, 1, 0)),
+    ("%Y/%m/%d", re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})", re.ASCII), (0, 1, 2)),
+    ("%d-%m-%Y", re.compile(r"(\d{1,2})-(\d{1,2})-(\d{4})", re.ASCII), (2, 1, 0)),
+)
+
+FORMATOS_FECHA = tuple(f[0] for f in _FORMATOS)
+
+def columnas_fecha(columnas) -> list[str]:
+    return [c for c in columnas if 'fecha' in c.lower()]
+
+def _parsear(texto: str, formatos) -> date | None:
+    for _, patron, (i_anio, i_mes, i_dia) in formatos:
+        m = patron.fullmatch(texto)
+        if m is None:
+            continue
+        g = m.groups()
+        try:
+            return date(int(g[i_anio]), int(g[i_mes]), int(g[i_dia]))
+        except ValueError:
+            return None  # calza con el patrón pero no es una fecha válida (p. ej. 31/02)
+    return None
+
+class NormalizadorFechas:
+    def __init__(self, columnas, muestra: int = 500, memo_max: int = 100_000):
+        """columnas: columnas de fecha a normalizar; muestra: filas usadas para inferir el formato."""
+        self.columnas = list(columnas)
+        self.muestra = muestra
+        self.memo_max = memo_max
+        self.dominante: dict[str, str | None] = {}   # columna → formato inferido
+        self._formatos: dict[str, tuple] = {c: _FORMATOS for c in self.columnas}
+        self._memo: dict[str, object] = {}
+        self._inferido = False
+
+    def inferir(self, lote) -> None:
+        """Ordena los formatos de cada columna según cuántas celdas de la muestra (un Lote) calzan."""
+        for col in self.columnas:
+            conteo = [0] * len(_FORMATOS)
+            for val in lote.columna(col)[:self.muestra]:
+                if not isinstance(val, str):
+                    continue
+                for i, (_, patron, _) in enumerate(_FORMATOS):
+                    if patron.fullmatch(val):
+                        conteo[i] += 1
+                        break
+            orden = sorted(range(len(_FORMATOS)), key=lambda i: -conteo[i])
+            self._formatos[col] = tuple(_FORMATOS[i] for i in orden)
+            self.dominante[col] = _FORMATOS[orden[0]][0] if conteo[orden[0]] else None
+        self._inferido = True
+
+    def normalizar(self, col: str, val):
+        """date si `val` es texto con fecha reconocible; si no, el valor tal cual."""
+        if not isinstance(val, str):
+            return val
+        previo = self._memo.get(val)
+        if previo is not None:
+            return previo
+        # Los formatos no se solapan: el resultado no depende del orden ni de la columna
+        resultado = _parsear(val, self._formatos[col]) or val
+        if len(self._memo) >= self.memo_max:
+            self._memo.clear()
+        self._memo[val] = resultado
+        return resultado
+
+    def normalizar_lote(self, lote) -> None:
+        """Reemplaza en su lugar las columnas de fecha de un Lote; el primero sirve de muestra."""
+        if not self.columnas:
+            return
+        if not self._inferido:
+            self.inferir(lote)
+        normalizar = self.normalizar
+        for col in self.columnas:
+            if col in lote:
+                lote.fijar_columna(col, [normalizar(col, v) for v in lote.columna(col)])
@@ -0,0 +1,135 @@
+"""
+Lotes de filas compactos, por columnas.
+
+El cursor entrega tuplas; en vez de armar un dict por fila (con las claves
+repetidas en cada una) un Lote guarda una secuencia por columna y un
+Esquema (nombre → índice) compartido por todos los lotes de la consulta.
+Las coordenadas de mapa van en arreglos tipados ('d', NaN = sin valor).
+
+Las etapas del flujo trabajan por columna (leer, reemplazar, agregar) y los
+sumideros recorren tuplas; quien necesite "una fila" usa VistaFila, que no
+copia nada.
+"""
+import math
+from array import array
+from itertools import repeat
+
+class Esquema:
+    __slots__ = ("nombres", "indice", "_extendidos")
+
+    def __init__(self, nombres):
+        self.nombres = tuple(nombres)
+        self.indice = {n: i for i, n in enumerate(self.nombres)}
+        self._extendidos: dict[str, "Esquema"] = {}
+
+    def __contains__(self, nombre) -> bool:
+        return nombre in self.indice
+
+    def con(self, nombre: str) -> "Esquema":
+        """Esquema con una columna más al final (el mismo objeto para todos los lotes)."""
+        esquema = self._extendidos.get(nombre)
+        if esquema is None:
+            esquema = self._extendidos[nombre] = Esquema(self.nombres + (nombre,))
+        return esquema
+
+class Lote:
+    __slots__ = ("esquema", "columnas", "_n")
+
+    def __init__(self, esquema: Esquema, columnas: list, n: int):
+        self.esquema = esquema
+        self.columnas = columnas   # una secuencia por columna, en el orden del esquema
+        self._n = n
+
+    @classmethod
+    def desde_tuplas(cls, esquema: Esquema, filas) -> "Lote":
+        if filas:
+            columnas = list(zip(*filas))
+        else:
+            columnas = [() for _ in esquema.nombres]
+        return cls(esquema, columnas, len(filas))
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, nombre) -> bool:
+        return nombre in self.esquema.indice
+
+    def __getitem__(self, i: int) -> "VistaFila":
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return VistaFila(self, i)
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield VistaFila(self, i)
+
+    def arreglo(self, nombre: str):
+        """Secuencia tal como está guardada (arreglos tipados incluidos)."""
+        return self.columnas[self.esquema.indice[nombre]]
+
+    def columna(self, nombre: str, defecto=None):
+        """Valores de Python de la columna (NaN de un arreglo → None); `defecto` si no existe."""
+        i = self.esquema.indice.get(nombre)
+        if i is None:
+            return [defecto] * self._n
+        valores = self.columnas[i]
+        if isinstance(valores, array):
+            return [None if math.isnan(v) else v for v in valores]
+        return valores
+
+    def fijar_columna(self, nombre: str, valores) -> None:
+        """Reemplaza la columna o la agrega al final si no existe."""
+        i = self.esquema.indice.get(nombre)
+        if i is None:
+            self.esquema = self.esquema.con(nombre)
+            self.columnas.append(valores)
+        else:
+            self.columnas[i] = valores
+
+    def fijar_numerica(self, nombre: str, valores) -> None:
+        """fijar_columna en un arreglo de dobles; None se guarda como NaN."""
+        nan = math.nan
+        self.fijar_columna(nombre, array('d', (nan if v is None else v for v in valores)))
+
+    def conservar(self, indices) -> None:
+        """Deja solo las filas `indices` (en orden), en su lugar; los arreglos tipados siguen tipados."""
+        indices = list(indices)
+        self.columnas = [
+            array(c.typecode, [c[i] for i in indices]) if isinstance(c, array) else [c[i] for i in indices]
+            for c in self.columnas
+        ]
+        self._n = len(indices)
+
+    def tuplas(self, nombres, defecto=''):
+        """Filas como tuplas con solo `nombres` (en ese orden); `defecto` para columnas ausentes."""
+        if not nombres:
+            return repeat((), self._n)
+        return zip(*(self.columna(n, defecto) for n in nombres))
+
+class VistaFila:
+    """Una fila de un Lote, leída por nombre de columna sin copiar valores."""
+    __slots__ = ("_lote", "_i")
+
+    def __init__(self, lote: Lote, i: int):
+        self._lote = lote
+        self._i = i
+
+    def get(self, nombre: str, defecto=None):
+        lote = self._lote
+        j = lote.esquema.indice.get(nombre)
+        if j is None:
+            return defecto
+        v = lote.columnas[j][self._i]
+        if isinstance(v, float) and math.isnan(v) and isinstance(lote.columnas[j], array):
+            return None
+        return v
+
+    def __getitem__(self, nombre: str):
+        if nombre not in self._lote.esquema.indice:
+            raise KeyError(nombre)
+        return self.get(nombre)
+
+    def __contains__(self, nombre) -> bool:
+        return nombre in self._lote.esquema.indice
@@ -0,0 +1,93 @@
+"""
+Flujo de filas por lotes: fuente → etapas → sumideros.
+
+La fuente entrega lotes (buscador.filas.Lote, por ejemplo de fetchmany en
+un cursor sin buffer); cada etapa modifica el lote en su lugar (reproyección, fechas...) y cada
+lote pasa una sola vez por todos los sumideros activos (CSV, Excel, puntos
+del mapa...). Nada guarda el resultado completo: la memoria depende del
+tamaño de lote, no de cuántas filas devuelve la búsqueda.
+
+Un sumidero tiene:
+- escribir(lote) → bytes para enviar (o None si escribe por su cuenta);
+- cerrar() → bytes finales (o None); su resultado queda en el propio objeto.
+Cada uno declara `fase` (nombre de la fase en la Medicion) y, si cerrar()
+se mide aparte, `fase_cierre`.
+"""
+from .filas import Esquema, Lote
+from .metricas import Medicion
+
+def lotes_cursor(cursor, tamano: int, medicion: Medicion):
+    """
+    Lotes de fetchmany(tamano) hasta agotar el cursor (de tuplas, no
+    dictionary=True), midiendo la fase "fetch" y contando filas.
+    """
+    esquema = Esquema(cursor.column_names)
+    while True:
+        with medicion.fase("fetch"):
+            filas = cursor.fetchmany(tamano)
+            if filas:
+                lote = Lote.desde_tuplas(esquema, filas)
+        if not filas:
+            return
+        medicion.contar("filas", len(filas))
+        yield lote
+
+def muestreo_uniforme(paso: int):
+    """
+    Etapa que conserva una fila de cada `paso`, contando posiciones a lo
+    largo de todo el flujo (no por lote): la muestra queda repartida de
+    forma pareja sobre el resultado completo.
+    """
+    vistas = 0
+    def etapa(lote):
+        nonlocal vistas
+        inicio = -vistas % paso
+        vistas += len(lote)
+        if paso > 1:
+            lote.conservar(range(inicio, len(lote), paso))
+    return etapa
+
+class Flujo:
+    def __init__(self, fuente, medicion: Medicion):
+        self._fuente = fuente
+        self._etapas = []
+        self.medicion = medicion
+        self.filas = 0
+
+    def etapa(self, nombre: str, funcion) -> "Flujo":
+        """funcion(lote) modifica el lote en su lugar; lo que devuelva se ignora."""
+        self._etapas.append((nombre, funcion))
+        return self
+
+    def __iter__(self):
+        for lote in self._fuente:
+            for nombre, funcion in self._etapas:
+                with self.medicion.fase(nombre):
+                    funcion(lote)
+            self.filas += len(lote)
+            yield lote
+
+    def hacia(self, *sumideros, avance=None):
+        """
+        Recorre el flujo una vez pasando cada lote por todos los sumideros;
+        entrega los bytes que devuelvan (para responder en streaming).
+        avance(filas) se llama tras cada lote.
+        """
+        for lote in self:
+            for sumidero in sumideros:
+                with self.medicion.fase(sumidero.fase):
+                    datos = sumidero.escribir(lote)
+                if datos:
+                    yield datos
+            if avance:
+                avance(self.filas)
+        for sumidero in sumideros:
+            with self.medicion.fase(getattr(sumidero, "fase_cierre", sumidero.fase)):
+                datos = sumidero.cerrar()
+            if datos:
+                yield datos
+
+    def volcar(self, *sumideros, avance=None) -> None:
+        """hacia() hasta el final, para sumideros que escriben por su cuenta (archivo, memoria)."""
+        for _ in self.hacia(*sumideros, avance=avance):
+            pass
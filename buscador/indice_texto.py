@@ -0,0 +1,179 @@
+"""
+Índice invertido para la búsqueda por palabra clave en "todas las columnas".
+
+Vive en un archivo SQLite FTS5 local que comparten los workers:
+- tokenizer unicode61 con remove_diacritics: "bogota" encuentra "Bogotá";
+- índices de prefijo: "Tyran melan" encuentra "Tyrannus melancholicus";
+- refresco incremental: las filas nuevas se agregan por PK y una pasada
+  completa compara hashes para recoger ediciones y borrados (la decide el
+  llamador: periódica o al cambiar los datos).
+
+La palabra clave se resuelve aquí a PKs candidatas y el SQL a MySQL pasa
+a ser `pk IN (...)` (más las filas aún no indexadas) en lugar de un
+LIKE '%...%' sobre cada columna.
+"""
+import hashlib
+import re
+import unicodedata
+
+from .sqlite_local import ConexionesSQLite, bloqueo_exclusivo
+
+_ESQUEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(
+    texto,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TABLE IF NOT EXISTS mapa (
+    pk    TEXT PRIMARY KEY,
+    docid INTEGER NOT NULL,
+    hash  TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+_TOKEN = re.compile(r"\w+")
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin tildes (misma normalización que el tokenizer)."""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+def tokens(palabra: str) -> list[str]:
+    """Palabras de la búsqueda, plegadas como las indexa el tokenizer."""
+    return _TOKEN.findall(plegar(palabra))
+
+def consulta_fts(palabra: str) -> str | None:
+    """'Tyran melan' → '"tyran"* "melan"*' (todas las palabras, por prefijo)."""
+    tokens_palabra = tokens(palabra)
+    if not tokens_palabra:
+        return None
+    return " ".join('"' + t.replace('"', '""') + '"*' for t in tokens_palabra)
+
+def _hash_texto(texto: str) -> str:
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=8).hexdigest()
+
+class IndiceTexto:
+    LOTE_SQL = 500  # variables por consulta IN (...)
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._conexiones = ConexionesSQLite(ruta, _ESQUEMA)
+
+    def _conexion(self):
+        return self._conexiones.conexion()
+
+    def _meta(self, clave: str):
+        fila = self._conexion().execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def _guardar_meta(self, conn, clave: str, valor) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", (clave, str(valor)))
+
+    @property
+    def listo(self) -> bool:
+        """True cuando ya terminó al menos una pasada completa."""
+        return self._meta("completo_en") is not None
+
+    def ultima_pk(self):
+        return self._meta("ultima_pk")
+
+    def completo_en(self) -> float | None:
+        valor = self._meta("completo_en")
+        return float(valor) if valor else None
+
+    def meta(self, clave: str) -> str | None:
+        """Valor guardado con refrescar(..., meta=...) en la última pasada completa."""
+        return self._meta(f"extra:{clave}")
+
+    # ---------- Consulta ----------
+    def buscar(self, palabra: str) -> tuple[list[str], str | None] | None:
+        """
+        (PKs como texto cuyas columnas contienen todas las palabras por prefijo,
+        última PK indexada). Las filas con PK mayor a esa todavía no están en
+        el índice. None si el índice no está listo o la palabra no tiene términos.
+        """
+        consulta = consulta_fts(palabra)
+        if consulta is None or not self.listo:
+            return None
+        # La marca se lee antes que los candidatos: una fila indexada entre
+        # ambas lecturas queda cubierta dos veces, nunca ninguna
+        ultima = self.ultima_pk()
+        filas = self._conexion().execute(
+            "SELECT m.pk FROM docs JOIN mapa m ON m.docid = docs.rowid WHERE docs MATCH ?",
+            (consulta,)
+        ).fetchall()
+        return [f[0] for f in filas], ultima
+
+    # ---------- Actualización ----------
+    def _aplicar_lote(self, conn, pks, textos) -> int:
+        """Inserta o reemplaza las filas cuyo texto cambió; devuelve cuántas cambiaron."""
+        claves = [str(pk) for pk in pks]
+        existentes = {}
+        for ini in range(0, len(claves), self.LOTE_SQL):
+            parte = claves[ini:ini + self.LOTE_SQL]
+            marcas = ",".join("?" * len(parte))
+            for pk, docid, h in conn.execute(
+                f"SELECT pk, docid, hash FROM mapa WHERE pk IN ({marcas})", parte
+            ):
+                existentes[pk] = (docid, h)
+
+        cambiadas = 0
+        for pk, texto in zip(claves, textos):
+            h = _hash_texto(texto)
+            previo = existentes.get(pk)
+            if previo is not None and previo[1] == h:
+                continue
+            if previo is not None:
+                conn.execute("DELETE FROM docs WHERE rowid = ?", (previo[0],))
+            docid = conn.execute("INSERT INTO docs (texto) VALUES (?)", (texto,)).lastrowid
+            conn.execute("INSERT OR REPLACE INTO mapa (pk, docid, hash) VALUES (?, ?, ?)", (pk, docid, h))
+            cambiadas += 1
+        return cambiadas
+
+    def actualizar(self, lotes, completo: bool, ahora: float, meta: dict | None = None) -> int:
+        """
+        Aplica lotes (pks, textos) ordenados por PK. Con completo=True los
+        lotes cubren toda la tabla, al final se borran las PKs no vistas y
+        se guarda `meta` (clave → valor) junto con la hora de la pasada.
+        """
+        conn = self._conexion()
+        cambiadas = 0
+        if completo:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS vistos (pk TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM vistos")
+        for pks, textos in lotes:
+            if not pks:
+                continue
+            with conn:
+                cambiadas += self._aplicar_lote(conn, pks, textos)
+                if completo:
+                    conn.executemany("INSERT OR IGNORE INTO vistos (pk) VALUES (?)", [(str(pk),) for pk in pks])
+                self._guardar_meta(conn, "ultima_pk", pks[-1])
+        if completo:
+            with conn:
+                conn.execute(
+                    "DELETE FROM docs WHERE rowid IN "
+                    "(SELECT docid FROM mapa WHERE pk NOT IN (SELECT pk FROM vistos))"
+                )
+                conn.execute("DELETE FROM mapa WHERE pk NOT IN (SELECT pk FROM vistos)")
+                conn.execute("DELETE FROM vistos")
+                self._guardar_meta(conn, "completo_en", ahora)
+                for clave, valor in (meta or {}).items():
+                    self._guardar_meta(conn, f"extra:{clave}", valor)
+        return cambiadas
+
+    def refrescar(self, crear_lotes, completo: bool, ahora: float, meta: dict | None = None) -> int | None:
+        """
+        crear_lotes(desde_pk) → iterable de (pks, textos). Incremental: desde la
+        última PK indexada; completo: desde el principio. Solo un worker a la vez
+        (devuelve None si otro lo está haciendo).
+        """
+        with bloqueo_exclusivo(self.ruta) as obtenido:
+            if not obtenido:
+                return None
+            desde = None if completo else self.ultima_pk()
+            return self.actualizar(crear_lotes(desde), completo, ahora, meta)
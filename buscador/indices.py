@@ -0,0 +1,69 @@
+"""
+Asesor de índices para los filtros del formulario.
+
+Al arrancar se lee SHOW INDEX de la tabla y, por cada filtro, se pide a
+EXPLAIN cuántas filas estima recorrer. Un filtro por igualdad (facetas)
+aprovecha un índice solo si su columna es la primera de alguno; uno por
+subcadena (LIKE '%texto%') no aprovecha ninguno, así que de esos solo se
+informa la estimación. No crea nada: solo diagnostica para el log.
+"""
+from dataclasses import dataclass
+
+@dataclass
+class DiagnosticoFiltro:
+    campo: str
+    columna: str
+    modo: str                    # 'igualdad' | 'subcadena'
+    indice: str | None           # índice cuya primera columna es `columna`
+    filas_estimadas: int | None  # "rows" de EXPLAIN (None si no se pudo estimar)
+    acceso: str | None           # "type" de EXPLAIN (ref, range, ALL...)
+
+    @property
+    def sin_indice(self) -> bool:
+        return self.modo == 'igualdad' and self.indice is None
+
+def indices_por_columna(filas_show_index) -> dict[str, str]:
+    """
+    Columna → nombre del índice en el que va primera, a partir de las filas
+    de SHOW INDEX (dicts). Se ignoran FULLTEXT/SPATIAL y los índices invisibles.
+    """
+    indices = {}
+    for fila in filas_show_index:
+        if int(fila.get('Seq_in_index') or 0) != 1:
+            continue
+        if str(fila.get('Index_type') or 'BTREE').upper() in ('FULLTEXT', 'SPATIAL'):
+            continue
+        if str(fila.get('Visible') or 'YES').upper() == 'NO':
+            continue
+        columna = fila.get('Column_name')
+        if columna and columna not in indices:
+            indices[columna] = fila.get('Key_name')
+    return indices
+
+def sugerencia_indice(tabla: str, columna: str, tipo: str = "") -> str:
+    """CREATE INDEX para una columna; las TEXT/BLOB necesitan longitud de prefijo."""
+    parte = f"`{columna}`(191)" if ('text' in tipo or 'blob' in tipo) else f"`{columna}`"
+    return f"CREATE INDEX `idx_{columna.lower()}` ON {tabla} ({parte})"
+
+def diagnosticar(consultar, tabla: str, filtros: dict[str, tuple[str, str]]) -> list[DiagnosticoFiltro]:
+    """
+    consultar(sql, valores) → lista de dicts; filtros: campo → (columna, modo).
+    Para EXPLAIN se usa un valor real de la columna (el primero no nulo),
+    así la estimación corresponde a una selección de faceta posible.
+    """
+    indices = indices_por_columna(consultar(f"SHOW INDEX FROM {tabla}", ()))
+    diagnosticos = []
+    for campo, (columna, modo) in filtros.items():
+        if modo == 'igualdad':
+            muestra = consultar(f"SELECT `{columna}` AS v FROM {tabla} WHERE `{columna}` IS NOT NULL LIMIT 1", ())
+            condicion, valores = f"`{columna}` = %s", (muestra[0]['v'] if muestra else "",)
+        else:
+            condicion, valores = f"`{columna}` LIKE %s", ("%a%",)
+        plan = consultar(f"EXPLAIN SELECT 1 FROM {tabla} WHERE {condicion}", valores)
+        filas = acceso = None
+        if plan:
+            filas = plan[0].get('rows')
+            filas = int(filas) if filas is not None else None
+            acceso = plan[0].get('type')
+        diagnosticos.append(DiagnosticoFiltro(campo, columna, modo, indices.get(columna), filas, acceso))
+    return diagnosticos
@@ -0,0 +1,132 @@
+"""
+Consultas de metadatos (facetas, columnas, conteos) en paralelo con
+mysql.connector.aio.
+
+Un hilo propio corre un event loop con un pool asíncrono chico. Las rutas
+de Flask, que son síncronas, le pasan un lote de consultas de solo lectura
+con consultar() y esperan a que terminen todas: la espera es la de la más
+lenta y no la suma. Cada consulta usa su propia conexión, porque MySQL no
+intercala consultas en una misma conexión.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+
+from mysql.connector import aio
+
+from .pool import PoolAgotado
+
+class PoolAsync:
+    """
+    Conexiones aio creadas a demanda, hasta `tamano` a la vez. Solo se usa
+    desde el event loop que la creó. Como en PoolConexiones, las ociosas por
+    más de `ping_tras` se validan con ping y las que superan `vida_max` se
+    reemplazan.
+    """
+
+    def __init__(self, config: dict, tamano: int = 5, vida_max: float = 1800.0, ping_tras: float = 10.0):
+        self.config = dict(config)
+        self.tamano = tamano
+        self.vida_max = vida_max
+        self.ping_tras = ping_tras
+        self._libres: deque = deque()   # (conexión, creada_en, devuelta_en); se reusa la última devuelta
+        self._cupos = asyncio.Semaphore(tamano)
+        self.en_uso = 0
+        self.creadas = 0
+        self.recicladas = 0
+        self.descartadas = 0
+
+    async def _obtener(self):
+        while self._libres:
+            conn, creada, devuelta = self._libres.pop()
+            ahora = time.monotonic()
+            if ahora - creada > self.vida_max:
+                await self._cerrar(conn)
+                self.recicladas += 1
+            elif ahora - devuelta > self.ping_tras and not await conn.is_connected():
+                await self._cerrar(conn)
+                self.descartadas += 1
+            else:
+                return conn, creada
+        conn = await aio.connect(**self.config)
+        self.creadas += 1
+        return conn, time.monotonic()
+
+    @staticmethod
+    async def _cerrar(conn) -> None:
+        try:
+            await conn.shutdown()  # sin QUIT: no bloquea si la conexión ya está cortada
+        except Exception:
+            pass
+
+    async def consultar(self, sql: str, valores=()) -> list:
+        async with self._cupos:
+            conn, creada = await self._obtener()
+            self.en_uso += 1
+            try:
+                cursor = await conn.cursor()
+                try:
+                    await cursor.execute(sql, valores)
+                    filas = await cursor.fetchall()
+                finally:
+                    await cursor.close()
+            except BaseException:
+                # Error o cancelación a mitad de la consulta: la conexión queda en estado incierto
+                await self._cerrar(conn)
+                self.descartadas += 1
+                raise
+            finally:
+                self.en_uso -= 1
+            self._libres.append((conn, creada, time.monotonic()))
+            return filas
+
+    def estadisticas(self) -> dict:
+        return {
+            "tamano": self.tamano,
+            "en_uso": self.en_uso,
+            "libres": len(self._libres),
+            "creadas": self.creadas,
+            "recicladas": self.recicladas,
+            "descartadas": self.descartadas,
+        }
+
+class ConsultasMetadatos:
+    """
+    Puente entre el código síncrono y el pool asíncrono. El event loop corre
+    en un hilo daemon creado con el objeto; el dueño crea uno por proceso
+    (los hilos no sobreviven a un fork).
+    """
+
+    def __init__(self, config: dict, tamano: int = 5, espera_max: float = 30.0, vida_max: float = 1800.0,
+                 ping_tras: float = 10.0):
+        self.espera_max = espera_max
+        self._loop = asyncio.new_event_loop()
+        # El semáforo del pool se liga al loop en el que se usa: se crea dentro de él
+        self._pool = self._loop.run_until_complete(self._crear_pool(config, tamano, vida_max, ping_tras))
+        threading.Thread(target=self._loop.run_forever, name="metadatos-async", daemon=True).start()
+
+    @staticmethod
+    async def _crear_pool(config, tamano, vida_max, ping_tras) -> PoolAsync:
+        return PoolAsync(config, tamano, vida_max, ping_tras)
+
+    async def _reunir(self, consultas) -> list:
+        return await asyncio.gather(*(self._pool.consultar(sql, valores) for sql, valores in consultas))
+
+    def consultar(self, consultas) -> list[list]:
+        """
+        consultas: [(sql, valores), ...] → filas (tuplas) de cada una, en el
+        mismo orden. Corren a la vez, hasta `tamano` conexiones; si alguna
+        falla se propaga su excepción. Sin respuesta en `espera_max`
+        segundos se cancelan y se lanza PoolAgotado.
+        """
+        futuro = asyncio.run_coroutine_threadsafe(self._reunir(list(consultas)), self._loop)
+        try:
+            return futuro.result(self.espera_max)
+        except concurrent.futures.TimeoutError:
+            futuro.cancel()
+            raise PoolAgotado(f"Consultas de metadatos sin respuesta en {self.espera_max:g} s") from None
+
+    def estadisticas(self) -> dict:
+        return self._pool.estadisticas()
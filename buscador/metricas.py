@@ -0,0 +1,225 @@
+"""
+Métricas de rendimiento: contadores e histogramas en formato Prometheus.
+
+Cada worker de gunicorn acumula sus propias métricas en memoria y vuelca una
+instantánea JSON (<directorio>/<pid>.json) cada pocos segundos; /metrics
+suma las instantáneas vigentes de todos los workers, así el resultado no
+depende de qué worker atiende el scrape.
+
+Por request, una Medicion junta el tiempo de cada fase (consulta, fetch,
+reproyección, escritura, render...) para el encabezado Server-Timing y lo
+observa en los histogramas al cerrar la respuesta (también en streaming).
+Si tracemalloc está activo (benchmarks) también guarda el pico de memoria
+de cada fase.
+"""
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Registro:
+    def __init__(self):
+        self._tipos: dict[str, tuple[str, str, tuple]] = {}  # nombre → (tipo, ayuda, buckets)
+        self._valores: dict[tuple, object] = {}              # (nombre, etiquetas) → float | [buckets..., suma, conteo]
+        self._recolectores = []
+        self._lock = threading.Lock()
+
+    def describir(self, nombre: str, tipo: str, ayuda: str, buckets=BUCKETS_SEGUNDOS) -> None:
+        """tipo: 'counter', 'gauge' o 'histogram'."""
+        self._tipos[nombre] = (tipo, ayuda, tuple(buckets) if tipo == "histogram" else ())
+
+    def registrar_recolector(self, funcion) -> None:
+        """funcion() se llama antes de cada instantánea (para fijar gauges con el estado actual)."""
+        self._recolectores.append(funcion)
+
+    def fijar(self, nombre: str, valor: float, **etiquetas) -> None:
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = valor
+
+    def incrementar(self, nombre: str, valor: float = 1, **etiquetas) -> None:
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def observar(self, nombre: str, valor: float, **etiquetas) -> None:
+        buckets = self._tipos[nombre][2]
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            h = self._valores.get(clave)
+            if h is None:
+                h = self._valores[clave] = [0] * (len(buckets) + 2)
+            i = bisect_left(buckets, valor)
+            if i < len(buckets):
+                h[i] += 1
+            h[-2] += valor
+            h[-1] += 1
+
+    # ---------- Instantáneas entre workers ----------
+    def instantanea(self) -> list:
+        for funcion in self._recolectores:
+            funcion()
+        with self._lock:
+            return [[nombre, list(etiquetas), valor if not isinstance(valor, list) else list(valor)]
+                    for (nombre, etiquetas), valor in self._valores.items()]
+
+    def volcar(self, directorio: str) -> None:
+        os.makedirs(directorio, exist_ok=True)
+        destino = os.path.join(directorio, f"{os.getpid()}.json")
+        temporal = f"{destino}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.instantanea(), f, separators=(",", ":"))
+        os.replace(temporal, destino)
+
+    def iniciar_volcado(self, directorio: str, intervalo: float, registrar_error=lambda e: None) -> None:
+        def hilo():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.volcar(directorio)
+                except OSError as e:
+                    registrar_error(e)
+        threading.Thread(target=hilo, name="volcado-metricas", daemon=True).start()
+
+    def instantaneas_vigentes(self, directorio: str, vigencia: float) -> list:
+        """Instantánea propia (al momento) más las de otros workers escritas hace menos de `vigencia` s."""
+        todas = [self.instantanea()]
+        propia = f"{os.getpid()}.json"
+        limite = time.time() - vigencia
+        try:
+            nombres = os.listdir(directorio)
+        except FileNotFoundError:
+            nombres = []
+        for nombre in nombres:
+            if not nombre.endswith(".json") or nombre == propia:
+                continue
+            ruta = os.path.join(directorio, nombre)
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)  # worker que ya no existe
+                    continue
+                with open(ruta, encoding="utf-8") as f:
+                    todas.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return todas
+
+    # ---------- Formato de texto Prometheus ----------
+    def texto(self, instantaneas: list) -> str:
+        suma: dict[tuple, object] = {}
+        for inst in instantaneas:
+            for nombre, etiquetas, valor in inst:
+                if nombre not in self._tipos:
+                    continue
+                clave = (nombre, tuple(tuple(e) for e in etiquetas))
+                previo = suma.get(clave)
+                if previo is None:
+                    suma[clave] = list(valor) if isinstance(valor, list) else valor
+                elif isinstance(valor, list):
+                    if len(valor) == len(previo):
+                        suma[clave] = [a + b for a, b in zip(previo, valor)]
+                else:
+                    suma[clave] = previo + valor
+
+        lineas = []
+        for nombre, (tipo, ayuda, buckets) in self._tipos.items():
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for (n, etiquetas), valor in sorted(suma.items()):
+                if n != nombre:
+                    continue
+                if tipo != "histogram":
+                    lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+                    continue
+                acumulado = 0
+                for limite, cuenta in zip(buckets, valor):
+                    acumulado += cuenta
+                    lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', _numero(limite)),))} {acumulado}")
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {valor[-1]}")
+                lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(valor[-2])}")
+                lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {valor[-1]}")
+        return "\n".join(lineas) + "\n"
+
+def _etiquetas(etiquetas) -> str:
+    if not etiquetas:
+        return ""
+    partes = []
+    for k, v in etiquetas:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+def _numero(valor) -> str:
+    if isinstance(valor, float) and (math.isinf(valor) or math.isnan(valor)):
+        return "+Inf" if valor > 0 else "NaN"
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+class Medicion:
+    """Fases de un request (o de una descarga en streaming) sobre una ruta."""
+
+    def __init__(self, registro: Registro, ruta: str):
+        self.registro = registro
+        self.ruta = ruta
+        self.inicio = time.perf_counter()
+        self.fases: dict[str, float] = {}   # nombre → segundos (acumulados si la fase se repite)
+        self.conteos: dict[str, int] = {}   # 'filas', 'bytes'
+        self.memoria: dict[str, int] = {}   # nombre → pico en bytes sobre lo asignado al entrar (solo con tracemalloc)
+        self._pila_memoria: list[list[int]] = []  # [base, pico] de las fases abiertas
+        self._cerrada = False
+
+    @contextmanager
+    def fase(self, nombre: str):
+        rastreo = tracemalloc.is_tracing()
+        if rastreo:
+            self._entrar_memoria()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sumar(nombre, time.perf_counter() - t0)
+            if rastreo:
+                self._salir_memoria(nombre)
+
+    def _entrar_memoria(self) -> None:
+        # reset_peak() borra el pico de las fases exteriores: se guarda antes en la pila
+        actual, pico = tracemalloc.get_traced_memory()
+        if self._pila_memoria:
+            self._pila_memoria[-1][1] = max(self._pila_memoria[-1][1], pico)
+        tracemalloc.reset_peak()
+        self._pila_memoria.append([actual, actual])
+
+    def _salir_memoria(self, nombre: str) -> None:
+        base, pico = self._pila_memoria.pop()
+        pico = max(pico, tracemalloc.get_traced_memory()[1])
+        self.memoria[nombre] = max(self.memoria.get(nombre, 0), pico - base)
+        if self._pila_memoria:
+            self._pila_memoria[-1][1] = max(self._pila_memoria[-1][1], pico)
+
+    def sumar(self, nombre: str, segundos: float) -> None:
+        self.fases[nombre] = self.fases.get(nombre, 0.0) + segundos
+
+    def contar(self, nombre: str, n: int) -> None:
+        self.conteos[nombre] = self.conteos.get(nombre, 0) + n
+
+    def server_timing(self) -> str:
+        partes = [f"{nombre};dur={segundos * 1000:.1f}" for nombre, segundos in self.fases.items()]
+        partes.append(f"total;dur={(time.perf_counter() - self.inicio) * 1000:.1f}")
+        return ", ".join(partes)
+
+    def cerrar(self) -> None:
+        """Pasa las fases y conteos a los histogramas (una sola vez)."""
+        if self._cerrada:
+            return
+        self._cerrada = True
+        r = self.registro
+        for nombre, segundos in self.fases.items():
+            r.observar("buscador_fase_segundos", segundos, ruta=self.ruta, fase=nombre)
+        r.observar("buscador_request_segundos", time.perf_counter() - self.inicio, ruta=self.ruta)
+        for nombre, n in self.conteos.items():
+            r.incrementar(f"buscador_{nombre}_total", n, ruta=self.ruta)
@@ -0,0 +1,144 @@
+"""
+Pool de conexiones MySQL por worker, con cola de espera.
+
+A diferencia de MySQLConnectionPool (que falla apenas no hay conexión
+libre), aquí un pedido espera hasta `espera_max` segundos en una cola
+acotada. Antes de entregar una conexión ociosa se valida con ping, y las
+que superan `vida_max` se cierran y se reemplazan (el proxy de Railway
+corta conexiones viejas sin avisar). Las conexiones se crean a demanda.
+"""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+class PoolAgotado(mysql.connector.errors.PoolError):
+    """No se obtuvo conexión dentro del tiempo de espera (o la cola está llena)."""
+
+class PoolConexiones:
+    def __init__(self, crear, tamano: int = 5, espera_max: float = 10.0, cola_max: int = 32,
+                 vida_max: float = 1800.0, ping_tras: float = 10.0):
+        """crear() → conexión nueva (por ejemplo lambda: mysql.connector.connect(**dbconfig))."""
+        self._crear = crear
+        self.tamano = tamano
+        self.espera_max = espera_max
+        self.cola_max = cola_max
+        self.vida_max = vida_max
+        self.ping_tras = ping_tras
+        self._libres: deque = deque()     # (conexión, creada_en, devuelta_en); se reusa la última devuelta
+        self._creadas_en: dict[int, float] = {}
+        self._abiertas = 0                 # en uso + libres + en creación
+        self._esperando = 0
+        self._cond = threading.Condition()
+        # Contadores acumulados
+        self.creadas = 0
+        self.recicladas = 0                # cerradas por vida_max
+        self.descartadas = 0               # cerradas por ping fallido o error durante el uso
+        self.agotado = 0
+
+    # ---------- Préstamo ----------
+    def obtener(self):
+        limite = time.monotonic() + self.espera_max
+        with self._cond:
+            while True:
+                if self._libres:
+                    conn, creada, devuelta = self._libres.pop()
+                    break
+                if self._abiertas < self.tamano:
+                    self._abiertas += 1
+                    conn = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0 or self._esperando >= self.cola_max:
+                    self.agotado += 1
+                    raise PoolAgotado(
+                        f"Sin conexiones libres ({self.tamano} en uso, {self._esperando} en espera)"
+                    )
+                self._esperando += 1
+                try:
+                    self._cond.wait(restante)
+                finally:
+                    self._esperando -= 1
+
+        # Fuera del lock: validar o crear puede tardar
+        if conn is not None:
+            ahora = time.monotonic()
+            if ahora - creada > self.vida_max:
+                self._olvidar(conn, reciclada=True)
+                conn = None
+            elif ahora - devuelta > self.ping_tras and not self._vive(conn):
+                self._olvidar(conn, reciclada=False)
+                conn = None
+        if conn is None:
+            try:
+                conn = self._crear()
+            except BaseException:
+                self._liberar_cupo()
+                raise
+            with self._cond:
+                self.creadas += 1
+                self._creadas_en[id(conn)] = time.monotonic()
+        return conn
+
+    def devolver(self, conn, descartar: bool = False) -> None:
+        """Devuelve la conexión al pool; con descartar=True (hubo un error) se cierra."""
+        with self._cond:
+            creada = self._creadas_en.get(id(conn), 0.0)
+        if descartar or time.monotonic() - creada > self.vida_max:
+            self._olvidar(conn, reciclada=not descartar)
+            self._liberar_cupo()
+            return
+        with self._cond:
+            self._libres.append((conn, creada, time.monotonic()))
+            self._cond.notify()
+
+    # ---------- Estado ----------
+    def estadisticas(self) -> dict:
+        with self._cond:
+            libres = len(self._libres)
+            return {
+                "tamano": self.tamano,
+                "en_uso": self._abiertas - libres,
+                "libres": libres,
+                "esperando": self._esperando,
+                "creadas": self.creadas,
+                "recicladas": self.recicladas,
+                "descartadas": self.descartadas,
+                "agotado": self.agotado,
+            }
+
+    # ---------- Internos ----------
+    def _olvidar(self, conn, reciclada: bool) -> None:
+        """
+        Cierra una conexión que no vuelve al pool y la cuenta; sale de
+        _creadas_en para que otra con el mismo id() no herede su edad.
+        El cupo lo libera (o lo reusa) el llamador.
+        """
+        with self._cond:
+            self._creadas_en.pop(id(conn), None)
+            if reciclada:
+                self.recicladas += 1
+            else:
+                self.descartadas += 1
+        self._cerrar(conn)
+
+    def _liberar_cupo(self) -> None:
+        with self._cond:
+            self._abiertas -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _vive(conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _cerrar(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,131 @@
+"""
+Puntos del mapa por búsqueda, con un índice espacial en grilla.
+
+Cada búsqueda (identificada por la firma de sus filtros) se convierte una vez
+en un ConjuntoPuntos: coordenadas WGS84 en arreglos tipados más los campos
+del popup. /api/puntos responde por bbox consultando solo las celdas de la
+grilla que tocan la vista, en vez de recorrer todos los puntos.
+"""
+import math
+import threading
+from array import array
+from collections import OrderedDict
+
+CAMPOS_POPUP = ('Nombre_cientifico', 'Nombre_comun', 'Codigo_de_muestra', 'Proyecto', 'Fecha_de_colecta')
+
+class ConjuntoPuntos:
+    def __init__(self, campos=CAMPOS_POPUP, celda_grados: float = 0.25):
+        self.campos = tuple(campos)      # nombres de los valores en `info`
+        self.celda = celda_grados
+        self.lat = array('d')
+        self.lon = array('d')
+        self.info: list[tuple] = []      # valores de CAMPOS_POPUP por punto
+        self.total_filas = 0
+        self.fallidas = 0                # filas con coordenadas que no se pudieron transformar
+        self.paso = 1                    # muestra de 1 de cada `paso` filas (vista previa)
+        self._celdas: dict[tuple[int, int], array] = {}
+        self._limites = None             # (oeste, sur, este, norte)
+        self.clusterizador = None        # clustering.Clusterizador, se asigna al terminar de construir
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def __getstate__(self):
+        # Para la caché de resultados: el clusterizador se reconstruye al cargar
+        estado = self.__dict__.copy()
+        estado['clusterizador'] = None
+        return estado
+
+    def _celda(self, lat: float, lon: float) -> tuple[int, int]:
+        return (math.floor(lon / self.celda), math.floor(lat / self.celda))
+
+    def agregar(self, lat: float, lon: float, info: tuple) -> None:
+        i = len(self.lat)
+        self.lat.append(lat)
+        self.lon.append(lon)
+        self.info.append(info)
+        clave = self._celda(lat, lon)
+        indices = self._celdas.get(clave)
+        if indices is None:
+            indices = self._celdas[clave] = array('I')
+        indices.append(i)
+        if self._limites is None:
+            self._limites = (lon, lat, lon, lat)
+        else:
+            o, s, e, n = self._limites
+            self._limites = (min(o, lon), min(s, lat), max(e, lon), max(n, lat))
+
+    def limites(self):
+        """(oeste, sur, este, norte) de todos los puntos, o None si no hay."""
+        return self._limites
+
+    def en_bbox(self, oeste: float, sur: float, este: float, norte: float) -> list[int]:
+        """Índices de los puntos dentro de la caja (bordes incluidos)."""
+        cx0, cy0 = self._celda(sur, oeste)
+        cx1, cy1 = self._celda(norte, este)
+        n_celdas = (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+        if n_celdas > len(self._celdas):
+            # Vista más grande que la grilla ocupada: recorrer solo celdas con puntos
+            candidatas = [idx for (cx, cy), idx in self._celdas.items()
+                          if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+        else:
+            candidatas = []
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    idx = self._celdas.get((cx, cy))
+                    if idx is not None:
+                        candidatas.append(idx)
+        lat, lon = self.lat, self.lon
+        resultado = []
+        for idx in candidatas:
+            for i in idx:
+                if sur <= lat[i] <= norte and oeste <= lon[i] <= este:
+                    resultado.append(i)
+        return resultado
+
+class CacheConjuntos:
+    """LRU pequeña (en proceso) de ConjuntoPuntos por firma de búsqueda."""
+
+    def __init__(self, maximo: int = 8):
+        self.maximo = maximo
+        self._datos: OrderedDict[str, ConjuntoPuntos] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str, construir) -> ConjuntoPuntos:
+        with self._lock:
+            conjunto = self._datos.get(clave)
+            if conjunto is not None:
+                self._datos.move_to_end(clave)
+                return conjunto
+        conjunto = construir()
+        with self._lock:
+            self._datos[clave] = conjunto
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+        return conjunto
+
+class SumideroPuntos:
+    """Sumidero de buscador.flujo: arma un ConjuntoPuntos con lotes ya reproyectados (Latitud_mapa/Longitud_mapa)."""
+    fase = "puntos"
+
+    def __init__(self, campos=CAMPOS_POPUP, formatear=lambda v: v, celda_grados: float = 0.25):
+        self.conjunto = ConjuntoPuntos(campos, celda_grados)
+        self._formatear = formatear
+
+    def escribir(self, lote) -> None:
+        formatear, agregar = self._formatear, self.conjunto.agregar
+        lats, lons = lote.arreglo('Latitud_mapa'), lote.arreglo('Longitud_mapa')
+        for la, lo, info in zip(lats, lons, lote.tuplas(self.conjunto.campos, None)):
+            if not math.isnan(la):
+                agregar(la, lo, tuple(formatear(v) for v in info))
+
+    def cerrar(self) -> None:
+        pass
+
+def muestrear(indices: list[int], maximo: int) -> list[int]:
+    """Toma `maximo` índices repartidos uniformemente."""
+    if len(indices) <= maximo:
+        return indices
+    paso = len(indices) / maximo
+    return [indices[int(k * paso)] for k in range(maximo)]
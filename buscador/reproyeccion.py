@@ -0,0 +1,171 @@
+"""
+Reproyección de coordenadas al WGS84 (EPSG:4326) por lotes.
+
+- Un Transformer de pyproj por código EPSG, creado una sola vez por worker.
+- Las filas se agrupan por Codigo_EPSG_decimal y cada grupo se transforma
+  con una sola llamada sobre arreglos (array('d')), no punto por punto.
+- Las coordenadas con coma decimal ("4,5123") se parsean en bloque y las
+  fallas se cuentan por motivo en un ResumenReproyeccion.
+"""
+import math
+import threading
+from array import array
+from dataclasses import dataclass
+
+from pyproj import Transformer
+from pyproj.exceptions import CRSError
+
+COL_LAT = 'Latitud_decimal'
+COL_LON = 'Longitud_decimal'
+COL_EPSG = 'Codigo_EPSG_decimal'
+
+# ==============================
+# CACHÉ DE TRANSFORMERS (PROCESO)
+# ==============================
+_transformadores: dict[str, Transformer] = {}
+_transformadores_lock = threading.Lock()
+
+def transformador(epsg: str) -> Transformer:
+    """Transformer EPSG:<epsg> → EPSG:4326 (lon/lat), cacheado para toda la vida del worker."""
+    t = _transformadores.get(epsg)
+    if t is None:
+        with _transformadores_lock:
+            t = _transformadores.get(epsg)
+            if t is None:
+                t = Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+                _transformadores[epsg] = t
+    return t
+
+def precargar(codigos) -> list[str]:
+    """Crea de antemano los Transformers de los EPSG dados; devuelve los que fallaron."""
+    fallidos = []
+    for epsg in codigos:
+        codigo = normalizar_epsg(epsg)
+        try:
+            if codigo is None:
+                raise CRSError(f"EPSG inválido: {epsg!r}")
+            transformador(codigo)
+        except CRSError:
+            fallidos.append(str(epsg))
+    return fallidos
+
+# ==============================
+# PARSEO DE VALORES
+# ==============================
+def _vacio(val) -> bool:
+    return val is None or (isinstance(val, str) and not val.strip())
+
+def normalizar_epsg(val) -> str | None:
+    """'3116', 3116, '3116.0' o 'EPSG:3116' → '3116'; None si no es un código."""
+    if _vacio(val):
+        return None
+    texto = str(val).strip().upper()
+    if texto.startswith("EPSG:"):
+        texto = texto[5:]
+    try:
+        numero = float(texto.replace(',', '.'))
+    except ValueError:
+        return None
+    if not numero.is_integer() or numero <= 0:
+        return None
+    return str(int(numero))
+
+def a_float(val) -> float:
+    """Número con coma o punto decimal → float (ValueError si no es numérico)."""
+    if isinstance(val, (int, float)):
+        return float(val)
+    if isinstance(val, str):
+        return float(val.strip().replace(',', '.'))
+    return float(val)  # Decimal y similares
+
+# ==============================
+# REPROYECCIÓN POR LOTES
+# ==============================
+# Motivo por fila (un byte por fila en los lotes)
+OK = 0
+SIN_COORDENADAS = 1   # latitud, longitud o EPSG vacíos
+INVALIDA = 2          # texto no numérico
+EPSG_DESCONOCIDO = 3  # código que PROJ no reconoce
+FUERA_DE_RANGO = 4    # inf/NaN o fuera de [-90, 90] / [-180, 180]
+
+@dataclass
+class ResumenReproyeccion:
+    total: int = 0
+    transformadas: int = 0
+    sin_coordenadas: int = 0
+    invalidas: int = 0
+    epsg_desconocido: int = 0
+    fuera_de_rango: int = 0
+
+    @classmethod
+    def desde_motivos(cls, motivos) -> "ResumenReproyeccion":
+        conteo = [0] * 5
+        for m in motivos:
+            conteo[m] += 1
+        return cls(len(motivos), *conteo)
+
+    @property
+    def fallidas(self) -> int:
+        """Filas con datos de coordenadas que no se pudieron llevar al mapa."""
+        return self.invalidas + self.epsg_desconocido + self.fuera_de_rango
+
+    def sumar(self, otro: "ResumenReproyeccion") -> None:
+        self.total += otro.total
+        self.transformadas += otro.transformadas
+        self.sin_coordenadas += otro.sin_coordenadas
+        self.invalidas += otro.invalidas
+        self.epsg_desconocido += otro.epsg_desconocido
+        self.fuera_de_rango += otro.fuera_de_rango
+
+def reproyectar_lote(lats, lons, epsgs):
+    """
+    Reproyecta secuencias paralelas de latitud, longitud y EPSG.
+    Devuelve (lat_wgs84, lon_wgs84, motivos): las posiciones que fallan
+    quedan en None y `motivos` (bytearray) dice por qué.
+    """
+    n = len(lats)
+    lat_out: list[float | None] = [None] * n
+    lon_out: list[float | None] = [None] * n
+    motivos = bytearray(n)
+
+    # epsg → (índices, x, y)
+    grupos: dict[str, tuple[list[int], array, array]] = {}
+    for i in range(n):
+        lat, lon, epsg = lats[i], lons[i], epsgs[i]
+        if _vacio(lat) or _vacio(lon) or _vacio(epsg):
+            motivos[i] = SIN_COORDENADAS
+            continue
+        try:
+            x = a_float(lon)
+            y = a_float(lat)
+        except (TypeError, ValueError):
+            motivos[i] = INVALIDA
+            continue
+        codigo = normalizar_epsg(epsg)
+        if codigo is None:
+            motivos[i] = EPSG_DESCONOCIDO
+            continue
+        grupo = grupos.get(codigo)
+        if grupo is None:
+            grupo = grupos[codigo] = ([], array('d'), array('d'))
+        grupo[0].append(i)
+        grupo[1].append(x)
+        grupo[2].append(y)
+
+    for codigo, (indices, xs, ys) in grupos.items():
+        try:
+            t = transformador(codigo)
+        except CRSError:
+            for i in indices:
+                motivos[i] = EPSG_DESCONOCIDO
+            continue
+        # errcheck=False: los puntos que PROJ no puede transformar salen como inf
+        lon_w, lat_w = t.transform(xs, ys, errcheck=False)
+        for j, i in enumerate(indices):
+            lo, la = lon_w[j], lat_w[j]
+            if math.isfinite(lo) and math.isfinite(la) and -90 <= la <= 90 and -180 <= lo <= 180:
+                lat_out[i] = la
+                lon_out[i] = lo
+            else:
+                motivos[i] = FUERA_DE_RANGO
+    return lat_out, lon_out, motivos
@@ -0,0 +1,55 @@
+"""
+Utilidades para los archivos SQLite locales (cachés e índices) que
+comparten los workers de gunicorn.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+class ConexionesSQLite:
+    """Una conexión por hilo y por proceso (nunca se reutiliza tras un fork)."""
+
+    def __init__(self, ruta: str, esquema: str = ""):
+        self.ruta = ruta
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._local = threading.local()
+        if esquema:
+            self.conexion().executescript(esquema)
+
+    def conexion(self) -> sqlite3.Connection:
+        actual = getattr(self._local, "conn", None)
+        if actual is None or actual[0] != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            actual = (os.getpid(), conn)
+            self._local.conn = actual
+        return actual[1]
+
+@contextmanager
+def bloqueo_exclusivo(ruta: str):
+    """
+    flock no bloqueante sobre <ruta>.lock: entrega True si este proceso
+    obtuvo el bloqueo y False si otro worker ya lo tiene.
+    """
+    with open(ruta + ".lock", "a") as candado:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(candado, fcntl.LOCK_UN)
@@ -0,0 +1,60 @@
+"""
+Autocompletado de los selectores de especie, municipio y proyecto.
+
+Por cada campo se arma, a partir de las facetas (valor, conteo), una lista
+ordenada de claves plegadas (minúsculas, sin tildes): una por valor y otra
+por cada palabra interna, así "melan" encuentra "Tyrannus melancholicus" y
+"bogota" encuentra "Bogotá". Una consulta es un bisect al primer prefijo y
+un recorrido hasta que deja de calzar; nunca se recorre la lista completa.
+
+El índice se reconstruye cuando cambian las facetas (desde el hilo que las
+recarga) y se reemplaza de una vez, sin bloquear las consultas.
+"""
+from bisect import bisect_left
+
+from .indice_texto import plegar
+
+class IndiceSugerencias:
+    def __init__(self, campos: dict[str, str]):
+        """campos: nombre público del campo → faceta de la que sale (p. ej. 'especie' → 'especies')."""
+        self.campos = dict(campos)
+        self._indices: dict[str, tuple[list, list, list]] = {}  # campo → (claves, posiciones, valores)
+
+    def reconstruir(self, facetas: dict) -> None:
+        indices = {}
+        for campo, faceta in self.campos.items():
+            valores = sorted(facetas.get(faceta, []), key=lambda vn: plegar(str(vn[0])))
+            entradas = []
+            for i, (valor, _) in enumerate(valores):
+                palabras = plegar(str(valor)).split()
+                for j in range(len(palabras)):
+                    entradas.append((" ".join(palabras[j:]), j, i))
+            entradas.sort()
+            indices[campo] = ([e[0] for e in entradas], [e[2] for e in entradas], valores)
+        self._indices = indices
+
+    def listo(self) -> bool:
+        return bool(self._indices)
+
+    def buscar(self, campo: str, texto: str, pagina: int = 1, por_pagina: int = 20) -> tuple[list, bool]:
+        """([(valor, conteo), ...], hay_mas) para el prefijo `texto`; sin texto, todos en orden alfabético."""
+        claves, posiciones, valores = self._indices.get(campo, ([], [], []))
+        desde = (max(pagina, 1) - 1) * por_pagina
+        prefijo = " ".join(plegar(texto).split())
+        if not prefijo:
+            return valores[desde:desde + por_pagina], len(valores) > desde + por_pagina
+
+        # Un valor puede calzar por varias palabras: se cuenta una sola vez
+        vistos, resultado = set(), []
+        i = bisect_left(claves, prefijo)
+        while i < len(claves) and claves[i].startswith(prefijo):
+            pos = posiciones[i]
+            i += 1
+            if pos in vistos:
+                continue
+            vistos.add(pos)
+            if len(vistos) > desde + por_pagina:
+                return resultado, True
+            if len(vistos) > desde:
+                resultado.append(valores[pos])
+        return resultado, False
@@ -0,0 +1,190 @@
+"""
+Trabajos de exportación en segundo plano.
+
+Cada trabajo corre en un pool de hilos acotado del worker que lo recibió,
+y su estado vive en un archivo JSON (<directorio>/<id>.json). Así cualquier
+worker de gunicorn puede responder /exportar/estado y /exportar/descargar.
+
+El id sale de la consulta (formato + filtros + columnas + versión de los
+datos): dos pedidos iguales comparten el mismo trabajo. La creación del
+archivo de estado con O_EXCL hace de candado entre workers.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PENDIENTE = "pendiente"
+CORRIENDO = "corriendo"
+LISTO = "listo"
+ERROR = "error"
+
+class LimiteTrabajos(Exception):
+    """El usuario ya tiene demasiados trabajos activos o la cola del worker está llena."""
+
+class ColaTrabajos:
+    LATIDO = 2.0  # seg entre escrituras de progreso
+
+    def __init__(self, directorio: str, max_concurrentes: int = 2, max_por_usuario: int = 2,
+                 cola_max: int = 16, abandono: float = 600.0):
+        """abandono: seg sin latido tras los que un trabajo en curso se da por muerto (worker colgado)."""
+        self.directorio = directorio
+        self.max_por_usuario = max_por_usuario
+        self.cola_max = cola_max
+        self.abandono = abandono
+        os.makedirs(directorio, exist_ok=True)
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_concurrentes, thread_name_prefix="exportacion")
+        self._en_cola = 0
+        self._lock = threading.Lock()
+
+    # ---------- Estado en disco ----------
+    def _ruta(self, id_trabajo: str) -> str:
+        return os.path.join(self.directorio, f"{id_trabajo}.json")
+
+    def estado(self, id_trabajo: str) -> dict | None:
+        try:
+            with open(self._ruta(id_trabajo), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar(self, estado: dict) -> None:
+        estado["actualizado"] = time.time()
+        ruta = self._ruta(estado["id"])
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(temporal, ruta)
+
+    def _crear_exclusivo(self, estado: dict) -> bool:
+        estado["actualizado"] = time.time()
+        try:
+            fd = os.open(self._ruta(estado["id"]), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        return True
+
+    def vivo(self, estado: dict) -> bool:
+        """True si el trabajo está activo y su worker sigue existiendo (y dando señales si ya corre)."""
+        if estado["estado"] not in (PENDIENTE, CORRIENDO):
+            return False
+        try:
+            os.kill(estado["pid"], 0)
+        except ProcessLookupError:
+            return False  # el worker se reinició
+        except PermissionError:
+            pass
+        return estado["estado"] == PENDIENTE or time.time() - estado["actualizado"] < self.abandono
+
+    def activos_de(self, dueno: str) -> int:
+        activos = 0
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".json"):
+                continue
+            estado = self.estado(nombre[:-5])
+            if estado and estado.get("dueno") == dueno and self.vivo(estado):
+                activos += 1
+        return activos
+
+    def olvidar(self, id_trabajo: str) -> None:
+        """Borra el estado de un trabajo que ya no corre (p. ej. su archivo fue limpiado)."""
+        estado = self.estado(id_trabajo)
+        if estado is not None and not self.vivo(estado):
+            try:
+                os.remove(self._ruta(id_trabajo))
+            except FileNotFoundError:
+                pass
+
+    def purgar(self, antes_de: float) -> None:
+        """Borra los estados fallidos o huérfanos sin cambios desde `antes_de` (los LISTO los borra olvidar)."""
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".json"):
+                continue
+            estado = self.estado(nombre[:-5])
+            if estado and estado["estado"] != LISTO and not self.vivo(estado) and estado["actualizado"] < antes_de:
+                self.olvidar(estado["id"])
+
+    # ---------- Ciclo de vida ----------
+    def iniciar(self, id_trabajo: str, dueno: str, ejecutar, meta: dict) -> dict:
+        """
+        Devuelve el estado del trabajo `id_trabajo`, lanzándolo si no existe
+        (o si el anterior falló o quedó huérfano). ejecutar(avance) debe
+        llamar avance(filas) a medida que escribe y devolver un dict con el
+        resultado (ruta del archivo, bytes...).
+        """
+        for _ in range(2):
+            previo = self.estado(id_trabajo)
+            if previo is not None:
+                if previo["estado"] == LISTO or self.vivo(previo):
+                    return previo
+                try:
+                    os.remove(self._ruta(id_trabajo))  # falló o quedó huérfano: se reintenta
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                if self._en_cola >= self.cola_max:
+                    raise LimiteTrabajos("Hay demasiadas exportaciones en curso; intente en unos minutos")
+                if self.activos_de(dueno) >= self.max_por_usuario:
+                    raise LimiteTrabajos(
+                        f"Ya tiene {self.max_por_usuario} exportaciones en curso; espere a que terminen"
+                    )
+                estado = {
+                    "id": id_trabajo, "dueno": dueno, "pid": os.getpid(), "estado": PENDIENTE, "creado": time.time(),
+                    "filas": 0, "total": meta.get("total"), "error": None, **meta,
+                }
+                if not self._crear_exclusivo(estado):
+                    continue  # otro worker lo creó justo ahora: se devuelve el suyo
+                self._en_cola += 1
+            self._ejecutor.submit(self._correr, dict(estado), ejecutar)
+            return estado
+        return self.estado(id_trabajo)
+
+    def _correr(self, estado: dict, ejecutar) -> None:
+        estado["estado"] = CORRIENDO
+        estado["iniciado"] = time.time()
+        self._guardar(estado)
+        ultimo = [time.monotonic()]
+
+        def avance(filas: int) -> None:
+            estado["filas"] = filas
+            if time.monotonic() - ultimo[0] >= self.LATIDO:
+                ultimo[0] = time.monotonic()
+                self._guardar(estado)
+
+        try:
+            estado.update(ejecutar(avance) or {})
+            estado["estado"] = LISTO
+        except Exception as e:
+            estado["estado"] = ERROR
+            estado["error"] = str(e)
+        finally:
+            estado["terminado"] = time.time()
+            self._guardar(estado)
+            with self._lock:
+                self._en_cola -= 1
+
+def progreso(estado: dict) -> dict:
+    """Resumen para el cliente: filas, porcentaje y ETA en segundos."""
+    filas, total = estado.get("filas", 0), estado.get("total")
+    porcentaje = eta = None
+    if estado["estado"] == LISTO:
+        porcentaje, eta = 100.0, 0
+    elif total:
+        porcentaje = round(min(filas / total, 1.0) * 100, 1)
+        inicio = estado.get("iniciado")
+        if inicio and filas:
+            transcurrido = time.time() - inicio
+            eta = round(transcurrido / filas * max(total - filas, 0))
+    return {
+        "id": estado["id"],
+        "estado": estado["estado"],
+        "formato": estado.get("formato"),
+        "filas": filas,
+        "total": total,
+        "porcentaje": porcentaje,
+        "eta_segundos": eta,
+        "error": estado.get("error"),
+    }
@@ -0,0 +1,45 @@
+"""
+Token de versión de los datos de la tabla.
+
+El token cambia cuando la tabla cambia y sirve para invalidar cachés
+(resultados, facetas, ETags). Probar la base en cada request sería tan caro
+como no cachear, así que el resultado de la sonda se reutiliza durante
+`intervalo` segundos.
+"""
+import threading
+import time
+
+class VersionDatos:
+    def __init__(self, sondear, intervalo: float = 30.0):
+        """`sondear()` consulta la base y devuelve un str que cambia con los datos."""
+        self._sondear = sondear
+        self.intervalo = intervalo
+        self._valor: str | None = None
+        self._cuando = 0.0
+        self._lock = threading.Lock()
+        self._oyentes = []
+
+    def al_cambiar(self, funcion) -> None:
+        """Registra funcion(version_nueva) para cuando el token cambie."""
+        self._oyentes.append(funcion)
+
+    def actual(self) -> str:
+        ahora = time.monotonic()
+        if self._valor is not None and ahora - self._cuando < self.intervalo:
+            return self._valor
+        with self._lock:
+            if self._valor is not None and time.monotonic() - self._cuando < self.intervalo:
+                return self._valor
+            anterior = self._valor
+            self._valor = self._sondear()
+            self._cuando = time.monotonic()
+            nuevo = self._valor
+        if anterior is not None and nuevo != anterior:
+            for funcion in self._oyentes:
+                funcion(nuevo)
+        return nuevo
+
+    def invalidar(self) -> None:
+        """Obliga a sondear en la próxima llamada."""
+        with self._lock:
+            self._cuando = 0.0
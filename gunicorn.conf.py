@@ -0,0 +1,21 @@
+# ==============================
+# CONFIGURACIÓN DE GUNICORN
+# ==============================
+# web: gunicorn -c gunicorn.conf.py
+# El master importa la app una sola vez (preload_app) y los workers la heredan
+# con el fork; cada worker arma su propio pool de MySQL, arranca sus hilos de
+# fondo y calienta las cachés en post_fork, antes de aceptar conexiones.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+# Debe cubrir el calentamiento (columnas, facetas, Transformers) además del request más lento
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+wsgi_app = "app:crear_app()"
+
+def post_fork(server, worker):
+    from app import preparar_worker
+    tiempos = preparar_worker()
+    server.log.info("Worker %s calentado en %.3f s", worker.pid, tiempos.get("worker", 0.0))